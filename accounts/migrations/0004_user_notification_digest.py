@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notification_digest',
+            field=models.CharField(choices=[('immediate', 'Immediately'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', max_length=10),
+        ),
+    ]
@@ -31,6 +31,20 @@ class User(AbstractUser):
         choices=NOTIFY_CHOICES,
         default=NOTIFY_EMAIL,
     )
+    # Digest: collect notifications and send one summary per period
+    DIGEST_IMMEDIATE = 'immediate'
+    DIGEST_HOURLY = 'hourly'
+    DIGEST_DAILY = 'daily'
+    DIGEST_CHOICES = [
+        (DIGEST_IMMEDIATE, 'Immediately'),
+        (DIGEST_HOURLY, 'Hourly digest'),
+        (DIGEST_DAILY, 'Daily digest'),
+    ]
+    notification_digest = models.CharField(
+        max_length=10,
+        choices=DIGEST_CHOICES,
+        default=DIGEST_IMMEDIATE,
+    )
     # Optional per-user targets/overrides
     ntfy_topic = models.CharField(max_length=200, blank=True, null=True)
     apprise_url = models.TextField(blank=True, null=True)
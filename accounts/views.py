@@ -58,7 +58,7 @@ def profile(request):
             if cfg.sonarr_url and cfg.sonarr_api_key:
                 sonarr_conf = (cfg.sonarr_url, cfg.sonarr_api_key)
             else:
-                inst = ArrInstance.objects.filter(enabled=True, kind='sonarr').order_by('order','id').first()
+                inst = next(iter(ArrInstance.enabled_instances('sonarr')), None)
                 if inst:
                     sonarr_conf = (inst.base_url, inst.api_key)
         except Exception:
@@ -67,7 +67,7 @@ def profile(request):
             if cfg.radarr_url and cfg.radarr_api_key:
                 radarr_conf = (cfg.radarr_url, cfg.radarr_api_key)
             else:
-                inst = ArrInstance.objects.filter(enabled=True, kind='radarr').order_by('order','id').first()
+                inst = next(iter(ArrInstance.enabled_instances('radarr')), None)
                 if inst:
                     radarr_conf = (inst.base_url, inst.api_key)
         except Exception:
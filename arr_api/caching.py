@@ -0,0 +1,123 @@
+# arr_api/caching.py
+"""
+Stale-while-revalidate caching with single-flight refresh.
+
+Values are stored as (value, soft_expiry, error). Until soft_expiry the value
+is fresh; afterwards it is still served while exactly one caller (holding a
+lock taken via cache.add) recomputes it. If the recompute fails the last good
+value is kept, and a value stored by another caller meanwhile is never
+overwritten. The hard cache TTL is ttl + STALE_TTL.
+"""
+import os
+import time
+from functools import wraps
+
+from django.core.cache import cache
+
+STALE_TTL = int(os.getenv("ARR_STALE_TTL", "900"))
+ERROR_TTL = int(os.getenv("ARR_ERROR_TTL", "30"))
+LOCK_TTL = int(os.getenv("ARR_REFRESH_LOCK_TTL", "30"))
+LOCK_WAIT = float(os.getenv("ARR_REFRESH_LOCK_WAIT", "5"))
+
+_MISSING = object()
+
+
+class CachedUpstreamError(Exception):
+    """Raised for a cold key whose last fetch failed recently."""
+
+
+def _store(key, value, ttl, error=None):
+    soft = time.time() + (ERROR_TTL if error else ttl)
+    cache.set(key, (value, soft, error), (ERROR_TTL if error else ttl) + STALE_TTL)
+
+
+def _load(key):
+    entry = cache.get(key)
+    if not isinstance(entry, tuple) or len(entry) != 3:
+        return None
+    return entry
+
+
+def swr_cached(key, ttl, default=_MISSING):
+    """
+    Decorate a fetch function with stale-while-revalidate caching.
+
+    key: callable(*args, **kwargs) -> cache key, or None to bypass the cache.
+    ttl: seconds a value counts as fresh.
+    default: returned instead of raising when a cold key cannot be fetched.
+
+    The wrapper accepts refresh=True (recompute now unless another caller is
+    already doing so, keep the old value and re-raise on error) and
+    ttl=<seconds> to override the freshness window.
+    """
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, refresh: bool = False, ttl: int | None = None, **kwargs):
+            k = key(*args, **kwargs)
+            if k is None:
+                return fn(*args, **kwargs)
+            fresh_for = ttl or wrapper.ttl
+            lock = f"{k}:lock"
+            entry = _load(k)
+
+            if entry is not None and not refresh:
+                value, soft, error = entry
+                if time.time() < soft:
+                    return _fail(error) if error else value
+                if not error:
+                    if not cache.add(lock, 1, LOCK_TTL):
+                        # someone else is refreshing: serve stale
+                        return value
+                    return _compute(k, lock, True, fresh_for, entry, False, args, kwargs)
+
+            have_lock = cache.add(lock, 1, LOCK_TTL)
+            if not have_lock:
+                if refresh and entry is not None and not entry[2]:
+                    # another caller is refreshing already: keep serving what we have
+                    return entry[0]
+                # cold key, another caller is fetching: wait briefly for its result
+                deadline = time.time() + LOCK_WAIT
+                while time.time() < deadline:
+                    time.sleep(0.05)
+                    entry = _load(k)
+                    if entry is not None and time.time() < entry[1]:
+                        return _fail(entry[2]) if entry[2] else entry[0]
+            return _compute(k, lock, have_lock, fresh_for, entry, refresh, args, kwargs)
+
+        def _compute(k, lock, have_lock, fresh_for, entry, refresh, args, kwargs):
+            try:
+                value = fn(*args, **kwargs)
+            except Exception as e:
+                current = _load(k)
+                if current is not None and not current[2] and (entry is None or current[1] != entry[1]):
+                    # another caller stored a good value meanwhile: keep it
+                    if refresh:
+                        raise
+                    return current[0]
+                if entry is not None and not entry[2]:
+                    # keep the last good value, retry after ERROR_TTL
+                    _store(k, entry[0], ERROR_TTL)
+                    if refresh:
+                        raise
+                    return entry[0]
+                msg = str(e) or e.__class__.__name__
+                _store(k, None, fresh_for, error=msg)
+                if refresh:
+                    raise
+                return _fail(msg)
+            else:
+                _store(k, value, fresh_for)
+                return value
+            finally:
+                if have_lock:
+                    cache.delete(lock)
+
+        def _fail(error):
+            if default is not _MISSING:
+                return default() if callable(default) else default
+            raise CachedUpstreamError(error)
+
+        wrapper.ttl = ttl
+        wrapper.cache_key = key
+        return wrapper
+    return deco
@@ -0,0 +1,172 @@
+# arr_api/calendar_sync.py
+"""
+Incremental sync of Sonarr/Radarr calendars into CalendarItem rows.
+
+A full sync downloads the whole window (with series objects) and replaces the
+local rows. Between full syncs only the part of the window that is already
+known is re-checked, with Sonarr episodes fetched without their series
+object; rows are rewritten only when their hash changed. The days past the
+synced window end are fetched in full. Series metadata comes from the stored
+rows (or one /api/v3/series/{id} call for a new series) and is renewed on the
+next full sync.
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from django.db import transaction
+from django.utils import timezone as dj_timezone
+
+from .models import CalendarItem, CalendarSyncState
+from .services import (
+    _get, _parse_dt, _sonarr_episode_fields, _sonarr_episode_row, _sonarr_series_fields,
+    _radarr_calendar_row, _is_upcoming, SERIES_FIELDS,
+)
+
+CAL_DELTA_SYNC = os.getenv("ARR_CAL_DELTA_SYNC", "true").lower() in ("1", "true", "yes")
+CAL_FULL_SYNC_INTERVAL = int(os.getenv("ARR_CAL_FULL_SYNC_INTERVAL", "3600"))  # seconds
+
+# request fan-out threads and the warmer thread sync concurrently; SQLite takes one writer at a time
+_write_lock = threading.Lock()
+
+def _hash(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _fetch(inst, start, end, full: bool = True) -> list[dict]:
+    params = {"start": start.isoformat(), "end": end.isoformat(), "unmonitored": "false"}
+    if inst.kind == "sonarr":
+        params["includeSeries"] = "true" if full else "false"
+    else:
+        params["includeMovie"] = "true"
+    url = f"{inst.base_url.rstrip('/')}/api/v3/calendar"
+    return _get(url, {"X-Api-Key": inst.api_key}, params=params) or []
+
+
+def _movie_air_date(row: dict):
+    dates = [_parse_dt(row.get(k)) for k in ("inCinemas", "physicalRelease", "digitalRelease")]
+    dates = sorted(d.date() for d in dates if d is not None)
+    today = datetime.now(timezone.utc).date()
+    upcoming = [d for d in dates if d >= today]
+    return (upcoming or dates or [None])[0]
+
+
+def _item(inst, raw: dict, series: dict | None = None):
+    """Return (item_id, air_date, row, hash) for one calendar entry."""
+    if inst.kind == "sonarr":
+        row = _sonarr_episode_row(inst.base_url, raw, raw.get("series") or {}) if series is None else {**series, **_sonarr_episode_fields(raw)}
+        aired = _parse_dt(row.get("airDateUtc"))
+        # Sonarr episodes are compared on their own fields only, so the lean fetch can be diffed
+        return row["episodeId"], (aired.date() if aired else None), row, _hash(_sonarr_episode_fields(raw))
+    row = _radarr_calendar_row(inst.base_url, raw.get("movie") or raw)
+    return row["movieId"], _movie_air_date(row), row, _hash(row)
+
+
+def _series_lookup(inst, stored: dict):
+    known = {}
+    for ci in stored.values():
+        sid = ci.data.get("seriesId")
+        if sid is not None and sid not in known:
+            known[sid] = {k: ci.data.get(k) for k in SERIES_FIELDS}
+
+    def lookup(sid):
+        if sid not in known:
+            url = f"{inst.base_url.rstrip('/')}/api/v3/series/{sid}"
+            known[sid] = _sonarr_series_fields(inst.base_url, _get(url, {"X-Api-Key": inst.api_key}) or {})
+        return known[sid]
+    return lookup
+
+
+def _rows_for(inst, days: int) -> list[dict]:
+    today = datetime.now(timezone.utc).date()
+    end = today + timedelta(days=days)
+    qs = CalendarItem.objects.filter(instance=inst).order_by("air_date", "item_id")
+    rows = [ci.data for ci in qs]
+    if inst.kind == "sonarr":
+        out = []
+        for r in rows:
+            aired = _parse_dt(r.get("airDateUtc"))
+            if r.get("seriesStatus") == "continuing" and (aired is None or today <= aired.date() <= end):
+                out.append(r)
+        return out
+    return [r for r in rows if _is_upcoming(r)]
+
+
+def sync_calendar(inst, days: int) -> list[dict]:
+    """
+    Bring the local calendar of `inst` up to date for the next `days` and return
+    its rows in the same shape as sonarr_calendar / radarr_calendar.
+    """
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    end = today + timedelta(days=days)
+    state, _ = CalendarSyncState.objects.get_or_create(instance=inst)
+    stored = {ci.item_id: ci for ci in CalendarItem.objects.filter(instance=inst)}
+
+    full = (
+        not CAL_DELTA_SYNC
+        or state.last_full_sync is None
+        or state.window_end is None
+        or state.window_end < today
+        or (now - state.last_full_sync).total_seconds() > CAL_FULL_SYNC_INTERVAL
+    )
+
+    items = {}
+    if full:
+        for raw in _fetch(inst, today, end):
+            item_id, air_date, row, h = _item(inst, raw)
+            items[item_id] = (air_date, row, h)
+    else:
+        head_end = min(state.window_end, end)
+        lookup = _series_lookup(inst, stored) if inst.kind == "sonarr" else None
+        for raw in _fetch(inst, today, head_end, full=False):
+            ci = stored.get(raw.get("id") if inst.kind == "sonarr" else (raw.get("movie") or raw).get("id"))
+            if inst.kind == "sonarr":
+                if ci is not None and ci.content_hash == _hash(_sonarr_episode_fields(raw)):
+                    items[ci.item_id] = (ci.air_date, ci.data, ci.content_hash)
+                    continue
+                item_id, air_date, row, h = _item(inst, raw, series=lookup(raw.get("seriesId")))
+            else:
+                item_id, air_date, row, h = _item(inst, raw)
+            items[item_id] = (air_date, row, h)
+        if end > state.window_end:
+            # the day at the old window end is fetched again; duplicates collapse by id
+            for raw in _fetch(inst, state.window_end, end):
+                item_id, air_date, row, h = _item(inst, raw)
+                items[item_id] = (air_date, row, h)
+
+    with _write_lock, transaction.atomic():
+        # another sync of this instance may have written while we fetched: diff against the rows as they are now
+        state = CalendarSyncState.objects.get(instance=inst)
+        stored = {ci.item_id: ci for ci in CalendarItem.objects.filter(instance=inst)}
+        covered_end = end if full or state.window_end is None else max(state.window_end, end)
+        new, changed = [], []
+        for item_id, (air_date, row, h) in items.items():
+            ci = stored.get(item_id)
+            if ci is None:
+                new.append(CalendarItem(instance=inst, item_id=item_id, air_date=air_date, data=row, content_hash=h))
+            elif ci.content_hash != h or ci.data != row:
+                ci.air_date, ci.data, ci.content_hash = air_date, row, h
+                ci.updated_at = dj_timezone.now()
+                changed.append(ci)
+        # everything up to the end we just fetched is authoritative; drop what disappeared
+        gone = [
+            ci.pk for item_id, ci in stored.items()
+            if item_id not in items and (full or state.window_end is None or end >= state.window_end
+                                         or ci.air_date is None or ci.air_date <= end)
+        ]
+        if new:
+            # other processes are not covered by _write_lock
+            CalendarItem.objects.bulk_create(new, batch_size=500, ignore_conflicts=True)
+        if changed:
+            CalendarItem.objects.bulk_update(changed, ["air_date", "data", "content_hash", "updated_at"], batch_size=500)
+        if gone:
+            CalendarItem.objects.filter(pk__in=gone).delete()
+        state.window_end = covered_end
+        state.last_sync = now
+        if full:
+            state.last_full_sync = now
+        state.save()
+    return _rows_for(inst, days)
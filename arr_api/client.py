@@ -0,0 +1,116 @@
+# arr_api/client.py
+"""Shared keep-alive HTTP sessions for Sonarr/Radarr calls.
+
+One requests.Session per Arr instance (scheme + host), so repeated calls
+against the same instance reuse pooled TCP/TLS connections.
+"""
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = int(os.getenv("ARR_HTTP_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("ARR_HTTP_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("ARR_HTTP_READ_TIMEOUT", "10"))
+RETRIES = int(os.getenv("ARR_HTTP_RETRIES", "2"))
+BACKOFF = float(os.getenv("ARR_HTTP_BACKOFF", "0.3"))
+
+_sessions: dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def _instance_key(url: str) -> str:
+    parts = urlsplit(url or "")
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def _new_session() -> requests.Session:
+    retry = Retry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=RETRIES,
+        status=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the shared session for the Arr instance serving ``url``."""
+    key = _instance_key(url)
+    s = _sessions.get(key)
+    if s is not None:
+        return s
+    with _lock:
+        s = _sessions.get(key)
+        if s is None:
+            s = _sessions[key] = _new_session()
+        return s
+
+
+def arr_request(url: str, api_key: str, params: dict | None = None, timeout: float | None = None) -> requests.Response:
+    """GET ``url`` through the pooled session. Raises requests exceptions and HTTPError."""
+    r = get_session(url).get(
+        url,
+        headers={"X-Api-Key": api_key},
+        params=params or {},
+        timeout=(CONNECT_TIMEOUT, timeout or READ_TIMEOUT),
+    )
+    r.raise_for_status()
+    return r
+
+
+def arr_get_json(base: str, api_key: str, path: str, params: dict | None = None, timeout: float | None = None):
+    """GET ``base + path`` and return decoded JSON, or None on any request/JSON error."""
+    if not base or not api_key:
+        return None
+    url = f"{base.rstrip('/')}{path}"
+    try:
+        return arr_request(url, api_key, params=params, timeout=timeout).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def connection_stats() -> dict:
+    """Connections opened vs. reused per instance since process start."""
+    out = {}
+    with _lock:
+        items = list(_sessions.items())
+    for key, s in items:
+        opened = requests_total = 0
+        for adapter in set(s.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                opened += getattr(pool, "num_connections", 0)
+                requests_total += getattr(pool, "num_requests", 0)
+        out[key] = {
+            "opened": opened,
+            "reused": max(0, requests_total - opened),
+            "requests": requests_total,
+        }
+    return out
+
+
+def close_sessions():
+    """Drop all pooled sessions (e.g. after instance URLs changed)."""
+    with _lock:
+        items = list(_sessions.values())
+        _sessions.clear()
+    for s in items:
+        try:
+            s.close()
+        except Exception:
+            pass
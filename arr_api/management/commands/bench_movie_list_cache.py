@@ -0,0 +1,118 @@
+import pickle
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from settingspanel.models import ArrInstance
+from arr_api.services import _movie_row, _radarr_get
+
+
+def _synthetic_movie(i: int) -> dict:
+    """Roughly the shape and size of a Radarr v3 /api/v3/movie item."""
+    return {
+        "id": i,
+        "title": f"Synthetic Movie {i}",
+        "originalTitle": f"Synthetic Movie {i}",
+        "alternateTitles": [
+            {"sourceType": "tmdb", "movieMetadataId": i, "title": f"Alt Title {i} {n}", "id": i * 10 + n}
+            for n in range(4)
+        ],
+        "sortTitle": f"synthetic movie {i}",
+        "sizeOnDisk": 8_000_000_000,
+        "status": "released",
+        "overview": "A synthetic overview used for cache benchmarks. " * 6,
+        "inCinemas": "2023-05-12T00:00:00Z",
+        "physicalRelease": "2023-08-01T00:00:00Z",
+        "digitalRelease": "2023-07-10T00:00:00Z",
+        "images": [
+            {"coverType": "poster", "url": f"/MediaCover/{i}/poster.jpg", "remoteUrl": f"https://image.tmdb.org/t/p/original/{i}p.jpg"},
+            {"coverType": "fanart", "url": f"/MediaCover/{i}/fanart.jpg", "remoteUrl": f"https://image.tmdb.org/t/p/original/{i}f.jpg"},
+        ],
+        "website": "https://example.org",
+        "year": 2023,
+        "hasFile": i % 3 != 0,
+        "youTubeTrailerId": "dQw4w9WgXcQ",
+        "studio": "Synthetic Studios",
+        "path": f"/movies/Synthetic Movie {i} (2023)",
+        "qualityProfileId": 1,
+        "monitored": True,
+        "minimumAvailability": "released",
+        "isAvailable": True,
+        "folderName": f"/movies/Synthetic Movie {i} (2023)",
+        "runtime": 120,
+        "cleanTitle": f"syntheticmovie{i}",
+        "imdbId": f"tt{i:07d}",
+        "tmdbId": 100000 + i,
+        "titleSlug": f"{100000 + i}",
+        "certification": "PG-13",
+        "genres": ["Action", "Drama", "Thriller"],
+        "tags": [],
+        "added": "2023-09-01T12:00:00Z",
+        "ratings": {
+            "imdb": {"votes": 1234, "value": 7.1, "type": "user"},
+            "tmdb": {"votes": 567, "value": 6.9, "type": "user"},
+            "rottenTomatoes": {"votes": 0, "value": 81, "type": "user"},
+        },
+        "movieFile": {
+            "movieId": i,
+            "relativePath": f"Synthetic Movie {i} (2023) Bluray-1080p.mkv",
+            "path": f"/movies/Synthetic Movie {i} (2023)/Synthetic Movie {i} (2023) Bluray-1080p.mkv",
+            "size": 8_000_000_000,
+            "dateAdded": "2023-09-02T12:00:00Z",
+            "quality": {"quality": {"id": 7, "name": "Bluray-2160p" if i % 7 == 0 else "Bluray-1080p", "source": "bluray", "resolution": 1080}, "revision": {"version": 1, "real": 0, "isRepack": False}},
+            "mediaInfo": {
+                "audioBitrate": 640000, "audioChannels": 5.1, "audioCodec": "AC3", "audioLanguages": "eng",
+                "audioStreamCount": 1, "videoBitDepth": 8, "videoBitrate": 9000000, "videoCodec": "x264",
+                "videoFps": 23.976, "resolution": "1920x800", "runTime": "2:00:00", "scanType": "Progressive",
+                "subtitles": "eng/fre/ger", "width": 3840 if i % 7 == 0 else 1920, "height": 800,
+            },
+            "originalFilePath": f"Synthetic.Movie.{i}.2023.1080p.BluRay.x264-GRP/movie.mkv",
+            "qualityCutoffNotMet": False,
+            "languages": [{"id": 1, "name": "English"}],
+            "releaseGroup": "GRP",
+            "edition": "",
+            "id": i,
+        } if i % 3 != 0 else None,
+        "collection": {"name": f"Synthetic Collection {i % 50}", "tmdbId": 200000 + i % 50},
+        "popularity": 12.5,
+    }
+
+
+def _measure(obj, rounds: int) -> tuple[int, float]:
+    blob = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        pickle.loads(blob)
+    return len(blob), (time.perf_counter() - t0) / rounds * 1000
+
+
+class Command(BaseCommand):
+    help = "Compare cache footprint of the raw Radarr movie list vs. the slim MovieRow projection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--instance', type=int, help='Benchmark the live list of this Radarr ArrInstance id.')
+        parser.add_argument('--movies', type=int, default=9000, help='Number of synthetic movies (default 9000).')
+        parser.add_argument('--rounds', type=int, default=10, help='Unpickle rounds to average (default 10).')
+
+    def handle(self, *args, **opts):
+        if opts.get('instance'):
+            try:
+                inst = ArrInstance.objects.get(pk=opts['instance'], kind='radarr')
+            except ArrInstance.DoesNotExist:
+                raise CommandError(f"Radarr instance {opts['instance']} not found")
+            base = inst.base_url
+            raw = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie") or []
+        else:
+            base = "http://radarr.local"
+            raw = [_synthetic_movie(i) for i in range(1, opts['movies'] + 1)]
+        slim = [_movie_row(base, m) for m in raw]
+
+        rounds = max(1, opts['rounds'])
+        raw_size, raw_ms = _measure(raw, rounds)
+        slim_size, slim_ms = _measure(slim, rounds)
+        self.stdout.write(f"movies: {len(raw)}")
+        self.stdout.write(f"raw  : {raw_size / 1024 / 1024:8.2f} MiB pickled, {raw_ms:8.2f} ms/unpickle")
+        self.stdout.write(f"slim : {slim_size / 1024 / 1024:8.2f} MiB pickled, {slim_ms:8.2f} ms/unpickle")
+        if slim_size:
+            self.stdout.write(self.style.SUCCESS(
+                f"slim is {raw_size / slim_size:.1f}x smaller and {raw_ms / max(slim_ms, 1e-9):.1f}x faster to load"
+            ))
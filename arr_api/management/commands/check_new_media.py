@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from arr_api.notifications import check_and_notify_users
+from arr_api.client import connection_stats
+from arr_api.outbox import NOTIFY_WORKER, drain_all
 
 class Command(BaseCommand):
     help = 'Checks for new media and sends notifications'
@@ -10,5 +12,11 @@ class Command(BaseCommand):
         try:
             check_and_notify_users()
             self.stdout.write(self.style.SUCCESS(f'[{timezone.now()}] Media check finished successfully'))
+            if not NOTIFY_WORKER:
+                # no separate run_notification_worker: deliver what this check queued
+                stats = drain_all()
+                self.stdout.write(f"  outbox: sent={stats['sent']} retry={stats['retry']} failed={stats['failed']}")
+            for host, st in connection_stats().items():
+                self.stdout.write(f"  {host}: connections opened={st['opened']} reused={st['reused']}")
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'[{timezone.now()}] Error during media check: {str(e)}'))
@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
-from arr_api.models import Movie4KSubscription, MovieSubscription, SeriesSubscription
+from arr_api.models import Movie4KSubscription
 from arr_api.services import tmdb_has_4k_any_instance
-from arr_api.notifications import radarr_movie_has_file, _enabled_instances, _sonarr_get
+from arr_api.notifications import delete_available_movie_subscriptions, delete_ended_series_subscriptions
 
 
 class Command(BaseCommand):
@@ -19,30 +19,17 @@ class Command(BaseCommand):
             except Exception:
                 continue
 
-        # Movie subs: remove where hasFile
-        for sub in MovieSubscription.objects.all():
-            try:
-                if radarr_movie_has_file(sub.movie_id):
-                    sub.delete()
-                    removed_movies += 1
-            except Exception:
-                continue
+        # Movie subs: remove where hasFile (one /api/v3/movie list per Radarr instance)
+        try:
+            removed_movies = delete_available_movie_subscriptions()
+        except Exception:
+            removed_movies = 0
 
-        # Series subs: remove where series ended
-        for sub in SeriesSubscription.objects.all():
-            try:
-                ended = False
-                for inst in _enabled_instances('sonarr'):
-                    s = _sonarr_get(inst.base_url, inst.api_key, f"/api/v3/series/{sub.series_id}") or {}
-                    status = (s.get('status') or '').lower()
-                    if status == 'ended':
-                        ended = True
-                        break
-                if ended:
-                    sub.delete()
-                    removed_series += 1
-            except Exception:
-                continue
+        # Series subs: remove where series ended (one /api/v3/series call per Sonarr instance)
+        try:
+            removed_series = delete_ended_series_subscriptions()
+        except Exception:
+            removed_series = 0
 
         self.stdout.write(self.style.SUCCESS(
             f"cleanup_stale_subs: 4k={removed_4k} movies={removed_movies} series={removed_series}"
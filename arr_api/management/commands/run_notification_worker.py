@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from arr_api.outbox import POLL_INTERVAL, WORKERS_PER_CHANNEL, drain_all, run_forever
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued notifications from the outbox (email, ntfy, apprise) with retry/backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver everything that is due and exit.')
+        parser.add_argument('--interval', type=int, default=POLL_INTERVAL, help=f'Seconds between polls when idle (default {POLL_INTERVAL}).')
+        parser.add_argument('--workers', type=int, default=WORKERS_PER_CHANNEL, help=f'Concurrent sends per channel (default {WORKERS_PER_CHANNEL}).')
+
+    def handle(self, *args, **opts):
+        if opts.get('once'):
+            stats = drain_all(workers_per_channel=opts['workers'])
+            self.stdout.write(self.style.SUCCESS(
+                f"[{timezone.now()}] Outbox: sent={stats['sent']} retry={stats['retry']} failed={stats['failed']}"
+            ))
+            return
+        self.stdout.write(f'[{timezone.now()}] Notification worker running (poll {opts["interval"]}s, {opts["workers"]} per channel)')
+        run_forever(interval=opts['interval'], workers_per_channel=opts['workers'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from arr_api.warmer import WARM_INTERVAL, warm_once, run_forever
+
+
+class Command(BaseCommand):
+    help = ("Refresh cached Sonarr/Radarr calendars and Radarr movie lists ahead of expiry. "
+            "Only useful across processes with a shared cache backend; the web process runs its own warmer thread.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and refresh every --interval seconds.')
+        parser.add_argument('--interval', type=int, default=WARM_INTERVAL, help=f'Seconds between refreshes (default {WARM_INTERVAL}).')
+
+    def handle(self, *args, **opts):
+        if opts.get('loop'):
+            self.stdout.write(f'[{timezone.now()}] Cache warmer running every {opts["interval"]}s')
+            run_forever(interval=opts['interval'])
+            return
+        stats = warm_once()
+        self.stdout.write(self.style.SUCCESS(
+            f"warm_arr_cache: refreshed={stats['refreshed']} failed={stats['failed']}"
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arr_api', '0003_movie4ksentnotification_movie4ksubscription'),
+        ('settingspanel', '0007_appsettings_notify_lookahead_days'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_end', models.DateField(null=True)),
+                ('last_full_sync', models.DateTimeField(null=True)),
+                ('last_sync', models.DateTimeField(null=True)),
+                ('instance', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_sync', to='settingspanel.arrinstance')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CalendarItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.IntegerField()),
+                ('air_date', models.DateField(null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('instance', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_items', to='settingspanel.arrinstance')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['instance', 'air_date'], name='arr_api_cal_instanc_3f58c8_idx')],
+                'unique_together': {('instance', 'item_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('arr_api', '0004_calendaritem_calendarsyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sentnotification',
+            name='reservation',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=32),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class SeriesSubscription(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='series_subscriptions')
@@ -42,6 +43,8 @@ class SentNotification(models.Model):
     media_title = models.CharField(max_length=255)
     air_date = models.DateField()
     sent_at = models.DateTimeField(auto_now_add=True)
+    # Nonce of the batch that inserted the row, used to read back bulk reservations
+    reservation = models.CharField(max_length=32, blank=True, default='', db_index=True)
 
     class Meta:
         # We dedupe per user + media (episodeId/movieId) + type + date
@@ -78,3 +81,70 @@ class Movie4KSentNotification(models.Model):
 
     def __str__(self):
         return f"4K sent {self.tmdb_id} -> {self.user}"
+
+
+class CalendarItem(models.Model):
+    """Locally synced Sonarr episode / Radarr movie from an instance calendar"""
+    instance = models.ForeignKey('settingspanel.ArrInstance', on_delete=models.CASCADE, related_name='calendar_items')
+    item_id = models.IntegerField()  # episodeId (Sonarr) or movieId (Radarr)
+    air_date = models.DateField(null=True)
+    data = models.JSONField(default=dict)
+    content_hash = models.CharField(max_length=40)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['instance', 'item_id']
+        indexes = [models.Index(fields=['instance', 'air_date'])]
+
+    def __str__(self):
+        return f"{self.instance_id}:{self.item_id}"
+
+
+class CalendarSyncState(models.Model):
+    """How far the local calendar of an instance reaches and when it was last fully synced"""
+    instance = models.OneToOneField('settingspanel.ArrInstance', on_delete=models.CASCADE, related_name='calendar_sync')
+    window_end = models.DateField(null=True)
+    last_full_sync = models.DateTimeField(null=True)
+    last_sync = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"sync {self.instance_id} -> {self.window_end}"
+
+
+class NotificationOutbox(models.Model):
+    """Queued notification, delivered by run_notification_worker"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('held', 'Held for digest'),
+        ('digested', 'Sent in digest'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='outbox')
+    subject = models.CharField(max_length=255)
+    body_text = models.TextField(blank=True)
+    html_message = models.TextField(blank=True)
+    click_url = models.URLField(max_length=500, blank=True)
+    # Template context of the event, used to render digests
+    context = models.JSONField(default=dict, blank=True)
+    # Digest message this event was folded into
+    digest = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='digest_items')
+    # Dedupe token to release when delivery finally fails, so a later check can queue it again
+    sent_notification = models.ForeignKey(SentNotification, null=True, blank=True, on_delete=models.SET_NULL)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.status}: {self.subject} -> {self.user}"
@@ -1,19 +1,45 @@
-from django.core.mail import send_mail
+import json
+import os
+import re
+import smtplib
+import threading
+import uuid
+from functools import lru_cache
+from html import unescape
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.conf import settings
+from django.core.cache import cache
 from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.html import escape
 from datetime import timedelta
 from settingspanel.models import AppSettings, ArrInstance
 # from accounts.utils import JellyfinClient  # not needed for availability; use Sonarr/Radarr instead
 import requests
 from dateutil.parser import isoparse
+from .client import arr_get_json
 import logging
 from django.db import transaction
 
 logger = logging.getLogger(__name__)
 
-def _set_runtime_email_settings():
-    app_settings = AppSettings.current()
+EPISODE_INDEX_TTL = int(os.getenv("ARR_EPISODE_INDEX_TTL", "60"))  # seconds
+SERIES_STATUS_TTL = int(os.getenv("ARR_SERIES_STATUS_TTL", "600"))  # seconds
+SUB_QUERY_CHUNK = 500  # ids per IN (...) query, below SQLite's variable limit
+
+
+def _chunks(items, size: int = SUB_QUERY_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def email_settings(app_settings=None) -> dict:
+    """
+    SMTP settings from AppSettings with Django settings as fallback.
+    Computed once per run and passed to get_email_connection(); global
+    settings are left untouched.
+    """
+    app_settings = app_settings or AppSettings.current()
     sec = (app_settings.mail_secure or '').strip().lower()
     use_tls = sec in ('tls', 'starttls', 'start_tls', 'tls1.2', 'tls1_2')
     use_ssl = sec in ('ssl', 'smtps')
@@ -21,41 +47,167 @@ def _set_runtime_email_settings():
     if use_ssl:
         use_tls = False
 
-    # Apply email settings dynamically for this process
-    settings.EMAIL_HOST = (app_settings.mail_host or settings.EMAIL_HOST)
+    host = app_settings.mail_host or settings.EMAIL_HOST
     # Port defaults if not provided
-    if app_settings.mail_port:
-        settings.EMAIL_PORT = int(app_settings.mail_port)
-    else:
-        if use_ssl and not settings.EMAIL_PORT:
-            settings.EMAIL_PORT = 465
-        elif use_tls and not settings.EMAIL_PORT:
-            settings.EMAIL_PORT = 587
-
-    settings.EMAIL_USE_TLS = use_tls
-    settings.EMAIL_USE_SSL = use_ssl
-
-    settings.EMAIL_HOST_USER = app_settings.mail_user or settings.EMAIL_HOST_USER
-    settings.EMAIL_HOST_PASSWORD = app_settings.mail_password or settings.EMAIL_HOST_PASSWORD
+    port = app_settings.mail_port or settings.EMAIL_PORT
+    if not port and use_ssl:
+        port = 465
+    elif not port and use_tls:
+        port = 587
 
     # From email fallback
-    if app_settings.mail_from:
-        settings.DEFAULT_FROM_EMAIL = app_settings.mail_from
-    elif not getattr(settings, 'DEFAULT_FROM_EMAIL', None):
-        host = (settings.EMAIL_HOST or 'localhost')
-        settings.DEFAULT_FROM_EMAIL = f'noreply@{host}'
-
-    # return summary for debugging
+    from_email = app_settings.mail_from or getattr(settings, 'DEFAULT_FROM_EMAIL', None) or f"noreply@{host or 'localhost'}"
     return {
-        'host': settings.EMAIL_HOST,
-        'port': settings.EMAIL_PORT,
-        'use_tls': settings.EMAIL_USE_TLS,
-        'use_ssl': settings.EMAIL_USE_SSL,
-        'from_email': settings.DEFAULT_FROM_EMAIL,
-        'auth_user_set': bool(settings.EMAIL_HOST_USER),
+        'host': host,
+        'port': int(port) if port else None,
+        'use_tls': use_tls,
+        'use_ssl': use_ssl,
+        'username': app_settings.mail_user or settings.EMAIL_HOST_USER,
+        'password': app_settings.mail_password or settings.EMAIL_HOST_PASSWORD,
+        'from_email': from_email,
     }
 
 
+def get_email_connection(cfg: dict | None = None):
+    cfg = cfg or email_settings()
+    return get_connection(
+        host=cfg['host'], port=cfg['port'], username=cfg['username'], password=cfg['password'],
+        use_tls=cfg['use_tls'], use_ssl=cfg['use_ssl'], fail_silently=False,
+    )
+
+
+def build_email(user, subject: str, body_text: str, html_message: str | None = None, from_email: str | None = None):
+    msg = EmailMultiAlternatives(subject=subject, body=body_text, from_email=from_email, to=[user.email])
+    if html_message:
+        msg.attach_alternative(html_message, "text/html")
+    return msg
+
+
+def _connection_dropped(exc: Exception) -> bool:
+    # idle timeout or "421 service not available": the server closed a connection we kept open
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code == 421
+    return isinstance(exc, (smtplib.SMTPServerDisconnected, ConnectionError))
+
+
+class EmailBatch:
+    """
+    One SMTP connection (TLS + AUTH done once) shared by all emails of a run.
+    Thread-safe; a failed send drops the connection and the next send reconnects.
+    If the server closed the connection while it sat idle, the message is
+    retried once on a fresh connection.
+    """
+
+    def __init__(self, cfg: dict | None = None):
+        self.cfg = cfg or email_settings()
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def send(self, user, subject: str, body_text: str, html_message: str | None = None) -> bool:
+        msg = build_email(user, subject, body_text, html_message, from_email=self.cfg['from_email'])
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None:
+                        self._conn = get_email_connection(self.cfg)
+                        self._conn.open()
+                    return self._conn.send_messages([msg]) == 1
+                except Exception as e:
+                    self._reset()
+                    if attempt or not _connection_dropped(e):
+                        raise
+
+    def _reset(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def close(self):
+        with self._lock:
+            self._reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _format_air_date(air_date) -> str | None:
+    """Format an ISO string or datetime as local 'dd.mm.YYYY HH:MM' for templates."""
+    if not air_date:
+        return None
+    try:
+        dt = isoparse(air_date) if isinstance(air_date, str) else air_date
+        try:
+            tz = timezone.get_current_timezone()
+            dt = dt.astimezone(tz)
+        except Exception:
+            pass
+        return dt.strftime('%d.%m.%Y %H:%M')
+    except Exception:
+        return str(air_date)
+
+
+def render_digest(user, items) -> tuple[str, str, str]:
+    """
+    Build one (subject, body_text, html) summary for a user's held outbox items.
+    Each item contributes its body text and its stored template context.
+    """
+    events = []
+    for it in items:
+        ctx = dict(it.context or {})
+        ctx.setdefault('title', it.subject)
+        ctx['air_date'] = _format_air_date(ctx.get('air_date'))
+        events.append(ctx)
+    subject = f"{len(items)} new releases" if len(items) != 1 else items[0].subject
+    body_text = "\n\n".join(it.body_text or it.subject for it in items)
+    try:
+        html = render_to_string('arr_api/email/digest_notification.html', {'username': user.username, 'items': events})
+    except Exception:
+        html = ''
+    return subject, body_text, html
+
+
+_USERNAME_SLOT = "__subscribarr_username__"
+_RENDER_CACHE_SIZE = 512
+_render_cache: dict = {}
+_STYLE_RE = re.compile(r'<(style|script|head)\b.*?</\1>', re.I | re.S)
+_BREAK_RE = re.compile(r'<\s*(br|/p|/div|/h[1-6]|/li|/tr)\b[^>]*>', re.I)
+_TAG_RE = re.compile(r'<[^<]+?>')
+_BLANK_RE = re.compile(r'\n\s*\n+')
+
+
+@lru_cache(maxsize=256)
+def html_to_text(html: str) -> str:
+    """Plain-text fallback of an HTML email: drop style/head, keep line breaks, unescape entities."""
+    text = _STYLE_RE.sub('', html)
+    text = _BREAK_RE.sub('\n', text)
+    text = unescape(_TAG_RE.sub('', text))
+    lines = (line.strip() for line in text.splitlines())
+    return _BLANK_RE.sub('\n\n', '\n'.join(lines)).strip()
+
+
+def render_event(template_name: str, ctx: dict, username: str) -> tuple[str, str]:
+    """
+    Render (html, text) of a notification template for one user. The event
+    part is rendered once per distinct context and cached; only the username
+    is filled in per recipient.
+    """
+    key = (template_name, json.dumps(ctx, sort_keys=True, default=str))
+    html = _render_cache.get(key)
+    if html is None:
+        html = render_to_string(template_name, {**ctx, 'username': _USERNAME_SLOT})
+        if len(_render_cache) >= _RENDER_CACHE_SIZE:
+            _render_cache.pop(next(iter(_render_cache)), None)
+        _render_cache[key] = html
+    text = html_to_text(html)
+    return html.replace(_USERNAME_SLOT, escape(username)), text.replace(_USERNAME_SLOT, username)
+
+
 def send_notification_email(
     user,
     media_title,
@@ -72,29 +224,15 @@ def send_notification_email(
     """
     Sendet eine Benachrichtigungs-E-Mail an einen User mit erweiterten Details
     """
-    eff = _set_runtime_email_settings()
+    eff = email_settings()
     logger.info(
         "Email settings: host=%s port=%s tls=%s ssl=%s from=%s auth_user_set=%s",
-        eff['host'], eff['port'], eff['use_tls'], eff['use_ssl'], eff['from_email'], eff['auth_user_set']
+        eff['host'], eff['port'], eff['use_tls'], eff['use_ssl'], eff['from_email'], bool(eff['username'])
     )
 
-    # Format air date if provided
-    air_date_str = None
-    if air_date:
-        try:
-            from dateutil.parser import isoparse as _iso
-            dt = _iso(air_date) if isinstance(air_date, str) else air_date
-            try:
-                tz = timezone.get_current_timezone()
-                dt = dt.astimezone(tz)
-            except Exception:
-                pass
-            air_date_str = dt.strftime('%d.%m.%Y %H:%M')
-        except Exception:
-            air_date_str = str(air_date)
+    air_date_str = _format_air_date(air_date)
 
     context = {
-        'username': user.username,
         'title': media_title,
         'type': 'Serie' if media_type == 'series' else 'Film',
         'overview': overview,
@@ -108,15 +246,9 @@ def send_notification_email(
     }
 
     subject = f"Neue {context['type']} verfügbar: {media_title}"
-    message = render_to_string('arr_api/email/new_media_notification.html', context)
+    message, body_text = render_event('arr_api/email/new_media_notification.html', context, user.username)
 
     # Fallback to dispatch respecting user preference
-    try:
-        # strip HTML tags for body_text basic fallback
-        import re
-        body_text = re.sub('<[^<]+?>', '', message)
-    except Exception:
-        body_text = message
     _dispatch_user_notification(user, subject=subject, body_text=body_text, html_message=message)
 
 
@@ -166,7 +298,9 @@ def _send_apprise(user, title: str, message: str):
     return app.notify(title=title, body=message)
 
 
-def _dispatch_user_notification(user, subject: str, body_text: str, html_message: str | None = None, click_url: str | None = None):
+def _dispatch_user_notification(user, subject: str, body_text: str, html_message: str | None = None,
+                                click_url: str | None = None, mailer: EmailBatch | None = None):
+    """Send via the user's channel, falling back to email. Pass mailer to reuse one SMTP connection."""
     channel = getattr(user, 'notification_channel', 'email') or 'email'
     if channel == 'ntfy':
         ok = _send_ntfy(user, title=subject, message=body_text, click_url=click_url)
@@ -179,24 +313,17 @@ def _dispatch_user_notification(user, subject: str, body_text: str, html_message
             return True
         # fallback to email
     try:
-        # Ensure email backend is configured from AppSettings at runtime
-        _set_runtime_email_settings()
-        send_mail(
-            subject=subject,
-            message=body_text,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return True
+        if mailer is not None:
+            return mailer.send(user, subject, body_text, html_message)
+        with EmailBatch() as single:
+            return single.send(user, subject, body_text, html_message)
     except Exception:
         return False
 
 
 def _enabled_instances(kind: str):
     """Return enabled ArrInstance list for a kind (sonarr|radarr). Fallback to legacy single settings if none exist."""
-    inst = list(ArrInstance.objects.filter(enabled=True, kind=kind).order_by('order', 'id'))
+    inst = ArrInstance.enabled_instances(kind)
     if inst:
         return inst
     # Fallback to legacy single-instance config
@@ -209,39 +336,83 @@ def _enabled_instances(kind: str):
 
 
 def _sonarr_get(url_base, api_key, path, params=None, timeout=10):
-    if not url_base or not api_key:
-        return None
-    url = f"{url_base.rstrip('/')}{path}"
-    try:
-        r = requests.get(url, headers={"X-Api-Key": api_key}, params=params or {}, timeout=timeout)
-        r.raise_for_status()
-        return r.json()
-    except requests.RequestException:
-        return None
+    return arr_get_json(url_base, api_key, path, params=params, timeout=timeout)
 
 
 def _radarr_get(url_base, api_key, path, params=None, timeout=10):
-    if not url_base or not api_key:
-        return None
-    url = f"{url_base.rstrip('/')}{path}"
-    try:
-        r = requests.get(url, headers={"X-Api-Key": api_key}, params=params or {}, timeout=timeout)
-        r.raise_for_status()
-        return r.json()
-    except requests.RequestException:
-        return None
+    return arr_get_json(url_base, api_key, path, params=params, timeout=timeout)
 
 
-def sonarr_episode_has_file(series_id: int, season: int, episode: int) -> bool:
+def sonarr_episode_index(inst, series_id: int, run_cache: dict | None = None) -> dict:
+    """
+    Map (season, episode) -> hasFile for one series on one Sonarr instance.
+    Memoized in run_cache for the current run and cached for EPISODE_INDEX_TTL
+    seconds, so each series is downloaded at most once per run.
+    """
+    run_key = (inst.pk or inst.base_url, series_id)
+    if run_cache is not None and run_key in run_cache:
+        return run_cache[run_key]
+    cache_key = f"arr:sonarr:v1:{inst.pk}:episodes:{series_id}" if inst.pk else None
+    index = cache.get(cache_key) if cache_key else None
+    if index is None:
+        data = _sonarr_get(inst.base_url, inst.api_key, "/api/v3/episode", params={"seriesId": series_id})
+        index = {}
+        for ep in data or []:
+            key = (ep.get("seasonNumber"), ep.get("episodeNumber"))
+            index[key] = index.get(key, False) or bool(ep.get("hasFile"))
+        if cache_key and data is not None:
+            cache.set(cache_key, index, EPISODE_INDEX_TTL)
+    if run_cache is not None:
+        run_cache[run_key] = index
+    return index
+
+
+def sonarr_episode_has_file(series_id: int, season: int, episode: int, run_cache: dict | None = None) -> bool:
     for inst in _enabled_instances('sonarr'):
-        data = _sonarr_get(inst.base_url, inst.api_key, "/api/v3/episode", params={"seriesId": series_id}) or []
-        for ep in data:
-            if ep.get("seasonNumber") == season and ep.get("episodeNumber") == episode:
-                if bool(ep.get("hasFile")):
-                    return True
+        if sonarr_episode_index(inst, series_id, run_cache=run_cache).get((season, episode)):
+            return True
     return False
 
 
+def sonarr_series_status(inst) -> dict | None:
+    """
+    Map seriesId -> status for every series on one Sonarr instance, from one
+    /api/v3/series call cached for SERIES_STATUS_TTL seconds. None if Sonarr
+    could not be reached.
+    """
+    cache_key = f"arr:sonarr:v1:{inst.pk}:series_status" if inst.pk else None
+    status = cache.get(cache_key) if cache_key else None
+    if status is None:
+        data = _sonarr_get(inst.base_url, inst.api_key, "/api/v3/series")
+        if data is None:
+            return None
+        status = {s.get("id"): (s.get("status") or "").lower() for s in data if s.get("id") is not None}
+        if cache_key:
+            cache.set(cache_key, status, SERIES_STATUS_TTL)
+    return status
+
+
+def ended_series_ids(series_ids=None) -> set:
+    """Series reported as ended by any enabled Sonarr instance, optionally limited to series_ids."""
+    ended = set()
+    for inst in _enabled_instances('sonarr'):
+        status = sonarr_series_status(inst) or {}
+        ended.update(sid for sid, st in status.items() if st == 'ended')
+    if series_ids is not None:
+        ended &= set(series_ids)
+    return ended
+
+
+def delete_ended_series_subscriptions() -> int:
+    """Drop every subscription to an ended series; returns the number of rows deleted."""
+    from .models import SeriesSubscription
+    ended = ended_series_ids(SeriesSubscription.objects.values_list('series_id', flat=True).distinct())
+    removed = 0
+    for ids in _chunks(ended):
+        removed += SeriesSubscription.objects.filter(series_id__in=ids).delete()[0]
+    return removed
+
+
 def radarr_movie_has_file(movie_id: int) -> bool:
     for inst in _enabled_instances('radarr'):
         data = _radarr_get(inst.base_url, inst.api_key, f"/api/v3/movie/{movie_id}")
@@ -252,6 +423,36 @@ def radarr_movie_has_file(movie_id: int) -> bool:
     return False
 
 
+def radarr_movie_ids_with_file() -> set:
+    """
+    Radarr movie ids that have a file on any enabled instance, taken from the
+    cached /api/v3/movie list of each instance (one call per instance).
+    """
+    from .services import _radarr_movie_list_cached
+    ids = set()
+    for inst in _enabled_instances('radarr'):
+        try:
+            if inst.pk:
+                ids.update(mid for mid, *_rest, has_file, _avail, _4k in _radarr_movie_list_cached(inst) if has_file)
+            else:
+                ids.update(m.get("id") for m in _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie") or [] if m.get("hasFile"))
+        except Exception:
+            continue
+    ids.discard(None)
+    return ids
+
+
+def delete_available_movie_subscriptions() -> int:
+    """Drop every movie subscription whose movie already has a file; returns the number of rows deleted."""
+    from .models import MovieSubscription
+    available = radarr_movie_ids_with_file()
+    subscribed = set(MovieSubscription.objects.values_list('movie_id', flat=True).distinct())
+    removed = 0
+    for ids in _chunks(available & subscribed):
+        removed += MovieSubscription.objects.filter(movie_id__in=ids).delete()[0]
+    return removed
+
+
 def get_todays_sonarr_calendar(lookahead_days: int = 0):
     from .services import sonarr_calendar
     items = []
@@ -311,12 +512,72 @@ def check_jellyfin_availability(user, media_id, media_type):
         return radarr_movie_has_file(media_id)
 
 
+def _reserve_sent_notifications(entries) -> dict:
+    """
+    Insert dedupe tokens for (user_id, media_id, media_type, air_date, media_title)
+    entries with one bulk INSERT that skips existing rows. Returns
+    {(user_id, media_id, media_type, air_date): pk} for the rows this call
+    inserted, i.e. the notifications that still have to be sent.
+    """
+    from .models import SentNotification
+    nonce = uuid.uuid4().hex
+    objs = {}
+    for user_id, media_id, media_type, air_date, title in entries:
+        objs.setdefault((user_id, media_id, media_type, air_date), SentNotification(
+            user_id=user_id, media_id=media_id, media_type=media_type, air_date=air_date,
+            media_title=title, reservation=nonce,
+        ))
+    if not objs:
+        return {}
+    with transaction.atomic():
+        SentNotification.objects.bulk_create(objs.values(), batch_size=SUB_QUERY_CHUNK, ignore_conflicts=True)
+    rows = SentNotification.objects.filter(reservation=nonce).values_list('pk', 'user_id', 'media_id', 'media_type', 'air_date')
+    return {(u, m, t, d): pk for pk, u, m, t, d in rows}
+
+
+def _release_sent_notifications(pks):
+    """Delete reserved tokens (failed dispatches) so the next run retries them."""
+    from .models import SentNotification
+    for ids in _chunks(pks):
+        try:
+            SentNotification.objects.filter(pk__in=ids).delete()
+        except Exception:
+            logger.exception("Could not release %d notification tokens", len(ids))
+
+
+def _title_key(title) -> str:
+    return (title or '').strip().casefold()
+
+
+def _movie_subscriptions_for(movie_idx: dict):
+    """
+    Movie subscriptions matching today's movies ({movieId: calendar row}) by
+    movie id, or by title for subscriptions stored without one (movie_id 0).
+    Titles are compared in Python: SQLite's LOWER() only folds ASCII and would
+    miss titles like "Ärger".
+    """
+    from .models import MovieSubscription
+    for ids in _chunks(movie_idx):
+        yield from MovieSubscription.objects.select_related('user').filter(movie_id__in=ids).iterator(chunk_size=SUB_QUERY_CHUNK)
+    titles = {_title_key(it.get('title')) for it in movie_idx.values() if it.get('title')}
+    if not titles:
+        return
+    by_title = [
+        pk for pk, title in MovieSubscription.objects.filter(movie_id=0).values_list('pk', 'title')
+        .iterator(chunk_size=SUB_QUERY_CHUNK)
+        if _title_key(title) in titles
+    ]
+    for pks in _chunks(by_title):
+        yield from MovieSubscription.objects.select_related('user').filter(pk__in=pks)
+
+
 def check_and_notify_users():
     """
     Hauptfunktion die periodisch aufgerufen wird.
     Prüft neue Medien und sendet Benachrichtigungen.
     """
-    from .models import SeriesSubscription, MovieSubscription, SentNotification
+    from .models import SeriesSubscription
+    from .outbox import _is_digest_user, enqueue_notifications
 
     # calendars for today
     cfg = AppSettings.current()
@@ -335,11 +596,17 @@ def check_and_notify_users():
     movie_idx = {it.get("movieId"): it for it in todays_movies if it.get("movieId")}
 
     today = timezone.now().date()
-
-    # Serien-Abos
-    for sub in SeriesSubscription.objects.select_related('user').all():
-        if sub.series_id not in series_idx:
-            continue
+    # per-run episode index: each (instance, series) is fetched once, however many users follow it
+    episode_index = {}
+
+    # Serien-Abos: only subscriptions to series with an episode in today's calendar
+    series_subs = (
+        sub
+        for ids in _chunks(series_idx)
+        for sub in SeriesSubscription.objects.select_related('user').filter(series_id__in=ids).iterator(chunk_size=SUB_QUERY_CHUNK)
+    )
+    pending = []  # (sub, episode_id, event_date, subject, body, template context)
+    for sub in series_subs:
         # iterate today's episodes for this series
         for ep in series_idx[sub.series_id]:
             season = ep.get("seasonNumber")
@@ -353,80 +620,67 @@ def check_and_notify_users():
                 ad = None
             if ad and getattr(sub, 'created_at', None) and sub.created_at.date() > ad:
                 continue
+            episode_id = ep.get('episodeId') or 0
+            if not episode_id:
+                continue
 
-            # duplicate guard will be handled atomically before dispatch
             # check availability via Sonarr hasFile
             # Early availability: notify immediately if file present, regardless of whether air date is today or within lookahead
-            if sonarr_episode_has_file(sub.series_id, season, number):
-                # Build subject/body
-                subj = f"New episode available: {sub.series_title} S{season:02d}E{number:02d}"
-                body = f"{sub.series_title} S{season:02d}E{number:02d} is now available."
-                # Prefer HTML email rendering if channel falls back to email
-                html = None
-                try:
-                    ctx = {
-                        'username': sub.user.username,
-                        'title': sub.series_title,
-                        'type': 'Serie',
-                        'overview': sub.series_overview,
-                        'poster_url': ep.get('seriesPoster'),
-                        'episode_title': ep.get('title'),
-                        'season': season,
-                        'episode': number,
-                        'air_date': ep.get('airDateUtc'),
-                    }
-                    html = render_to_string('arr_api/email/new_media_notification.html', ctx)
-                except Exception:
-                    pass
-                # Reserve duplicate token per episode atomically, then dispatch; rollback on failure
-                episode_id = ep.get('episodeId') or 0
-                if not episode_id:
-                    continue
-                event_date = ad or today
-                try:
-                    with transaction.atomic():
-                        token, created = SentNotification.objects.get_or_create(
-                            user=sub.user,
-                            media_id=episode_id,
-                            media_type='series',
-                            air_date=event_date,
-                            defaults={'media_title': sub.series_title}
-                        )
-                    if not created:
-                        continue
-                except Exception:
-                    continue
-                ok = _dispatch_user_notification(sub.user, subject=subj, body_text=body, html_message=html)
-                if not ok:
-                    # allow retry on next run
-                    try:
-                        SentNotification.objects.filter(
-                            user=sub.user,
-                            media_id=episode_id,
-                            media_type='series',
-                            air_date=event_date
-                        ).delete()
-                    except Exception:
-                        pass
-                else:
-                    # Auto-unsubscribe if series ended (no more releases expected)
-                    try:
-                        for inst in _enabled_instances('sonarr'):
-                            s = _sonarr_get(inst.base_url, inst.api_key, f"/api/v3/series/{sub.series_id}") or {}
-                            status = (s.get('status') or '').lower()
-                            if status == 'ended':
-                                sub.delete()
-                                break
-                    except Exception:
-                        pass
-
-    # Film-Abos
-    for sub in MovieSubscription.objects.select_related('user').all():
+            if not sonarr_episode_has_file(sub.series_id, season, number, run_cache=episode_index):
+                continue
+            # Build subject/body
+            subj = f"New episode available: {sub.series_title} S{season:02d}E{number:02d}"
+            body = f"{sub.series_title} S{season:02d}E{number:02d} is now available."
+            ctx = {
+                'title': sub.series_title,
+                'type': 'Serie',
+                'overview': sub.series_overview,
+                'poster_url': ep.get('seriesPoster'),
+                'episode_title': ep.get('title'),
+                'season': season,
+                'episode': number,
+                'air_date': ep.get('airDateUtc'),
+            }
+            pending.append((sub, episode_id, ad or today, subj, body, ctx))
+
+    # Reserve duplicate tokens for all episodes at once
+    try:
+        reserved = _reserve_sent_notifications(
+            (sub.user_id, episode_id, 'series', event_date, sub.series_title)
+            for sub, episode_id, event_date, _subj, _body, _ctx in pending
+        )
+    except Exception:
+        logger.exception("Could not reserve notification tokens")
+        reserved = {}
+    # Hand the messages to the outbox; run_notification_worker delivers them and releases tokens of failed sends
+    queued = []
+    for sub, episode_id, event_date, subj, body, ctx in pending:
+        # pop: a duplicated pending entry must not queue a second message on the same token
+        token = reserved.pop((sub.user_id, episode_id, 'series', event_date), None)
+        if token is None:
+            continue
+        # Prefer HTML email rendering if channel falls back to email; digest users get one summary later
+        html = None
+        if not _is_digest_user(sub.user):
+            try:
+                html, _text = render_event('arr_api/email/new_media_notification.html', ctx, sub.user.username)
+            except Exception:
+                pass
+        queued.append({'user': sub.user, 'subject': subj, 'body_text': body, 'html_message': html,
+                       'context': ctx, 'sent_notification_id': token})
+    try:
+        enqueue_notifications(queued)
+    except Exception:
+        logger.exception("Could not queue %d notifications", len(queued))
+        _release_sent_notifications(d['sent_notification_id'] for d in queued)
+
+    # Film-Abos: match today's movies by id, or by title for subscriptions without a movie id
+    for sub in _movie_subscriptions_for(movie_idx):
         it = movie_idx.get(sub.movie_id)
         # Fallback: if movie_id missing, try match by title
         if not it and getattr(sub, 'title', None):
             for _mid, _it in movie_idx.items():
-                if (_it.get('title') or '').strip().lower() == (sub.title or '').strip().lower():
+                if _title_key(_it.get('title')) == _title_key(sub.title):
                     it = _it
                     break
         if not it:
@@ -449,29 +703,15 @@ def check_and_notify_users():
 
         
 
-    # Cleanup lingering subs: ended series and movies already available
+    # Cleanup lingering subs: ended series (auto-unsubscribe, no more releases expected) and movies already available
     try:
-        for sub in SeriesSubscription.objects.select_related('user').all():
-            try:
-                for inst in _enabled_instances('sonarr'):
-                    s = _sonarr_get(inst.base_url, inst.api_key, f"/api/v3/series/{sub.series_id}") or {}
-                    status = (s.get('status') or '').lower()
-                    if status == 'ended':
-                        sub.delete()
-                        break
-            except Exception:
-                continue
+        delete_ended_series_subscriptions()
     except Exception:
-        pass
+        logger.exception("Could not remove subscriptions of ended series")
     try:
-        for sub in MovieSubscription.objects.select_related('user').all():
-            try:
-                if radarr_movie_has_file(sub.movie_id):
-                    sub.delete()
-            except Exception:
-                continue
+        delete_available_movie_subscriptions()
     except Exception:
-        pass
+        logger.exception("Could not remove subscriptions of available movies")
 
 
 def has_new_episode_today(series_id):
@@ -0,0 +1,293 @@
+# arr_api/outbox.py
+"""
+Persistent notification outbox.
+
+Checks (check_new_media, check_youtube) only write NotificationOutbox rows;
+delivery happens in drain_once(), called by run_notification_worker or by the
+check command itself when no separate worker runs. Events of users with an
+hourly/daily digest are held and folded into one message per user once their
+period is over. Each batch is delivered by
+a small thread pool per channel, so one slow SMTP server or ntfy endpoint
+only holds up its own channel. Failed sends are retried with exponential
+backoff; after NOTIFY_MAX_ATTEMPTS the row is marked failed and its dedupe
+token is released so a later check can queue it again. Finished rows are
+deleted after NOTIFY_OUTBOX_RETENTION_DAYS.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_WORKER = os.getenv("NOTIFY_WORKER", "false").lower() in ("1", "true", "yes")
+WORKERS_PER_CHANNEL = int(os.getenv("NOTIFY_WORKERS_PER_CHANNEL", "4"))
+MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+RETRY_BASE = int(os.getenv("NOTIFY_RETRY_BASE", "60"))  # seconds, doubled per attempt
+BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "100"))
+POLL_INTERVAL = int(os.getenv("NOTIFY_POLL_INTERVAL", "5"))
+CLAIM_TIMEOUT = int(os.getenv("NOTIFY_CLAIM_TIMEOUT", "600"))  # reclaim rows of a crashed worker
+DIGEST_HOUR = int(os.getenv("NOTIFY_DIGEST_HOUR", "18"))  # local hour the daily digest goes out
+RETENTION_DAYS = int(os.getenv("NOTIFY_OUTBOX_RETENTION_DAYS", "30"))  # keep finished rows this long, 0 = forever
+PURGE_INTERVAL = 3600  # seconds between retention sweeps of run_forever
+
+
+def _is_digest_user(user) -> bool:
+    return (getattr(user, 'notification_digest', 'immediate') or 'immediate') != 'immediate'
+
+
+def _outbox_row(user, subject: str, body_text: str, html_message: str | None = None, click_url: str | None = None,
+                context: dict | None = None, sent_notification_id: int | None = None) -> NotificationOutbox:
+    return NotificationOutbox(
+        user=user, subject=subject[:255], body_text=body_text or '', html_message=html_message or '',
+        click_url=click_url or '', context=context or {}, sent_notification_id=sent_notification_id,
+        # digest users: keep the event until build_due_digests folds it into a summary
+        status='held' if _is_digest_user(user) else 'pending',
+    )
+
+
+def enqueue_notification(user, subject: str, body_text: str, html_message: str | None = None,
+                         click_url: str | None = None, context: dict | None = None,
+                         sent_notification_id: int | None = None) -> NotificationOutbox:
+    row = _outbox_row(user, subject, body_text, html_message, click_url, context, sent_notification_id)
+    row.save()
+    return row
+
+
+def enqueue_notifications(items) -> int:
+    """
+    Bulk-queue dicts with user, subject, body_text and optional html_message,
+    click_url, context (template context for digests) and sent_notification_id.
+    """
+    rows = [
+        _outbox_row(it['user'], it['subject'], it.get('body_text'), it.get('html_message'), it.get('click_url'),
+                    it.get('context'), it.get('sent_notification_id'))
+        for it in items
+    ]
+    NotificationOutbox.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _digest_due(mode: str, oldest, now) -> bool:
+    if mode == 'hourly':
+        return oldest <= now - timedelta(hours=1)
+    if mode == 'daily':
+        local = timezone.localtime(now)
+        cutoff = local.replace(hour=DIGEST_HOUR, minute=0, second=0, microsecond=0)
+        if local < cutoff:
+            cutoff -= timedelta(days=1)
+        return oldest < cutoff
+    # user switched back to immediate delivery: flush what is held
+    return True
+
+
+def build_due_digests(now=None) -> int:
+    """Fold held events of users whose digest period is over into one outbox message each."""
+    from .notifications import render_digest
+    now = now or timezone.now()
+    groups = (
+        NotificationOutbox.objects.filter(status='held')
+        .values('user_id', 'user__notification_digest')
+        .annotate(oldest=Min('created_at'))
+    )
+    built = 0
+    for g in groups:
+        if not _digest_due(g['user__notification_digest'], g['oldest'], now):
+            continue
+        with transaction.atomic():
+            # claim the held rows first: a concurrent drain that got there before us leaves nothing to claim
+            claim = uuid.uuid4().hex
+            claimed = NotificationOutbox.objects.filter(user_id=g['user_id'], status='held').update(
+                status='digested', claimed_by=claim,
+            )
+            if not claimed:
+                continue
+            items = list(NotificationOutbox.objects.select_related('user').filter(claimed_by=claim, status='digested')
+                         .order_by('created_at', 'id'))
+            user = items[0].user
+            subject, body_text, html = render_digest(user, items)
+            digest = NotificationOutbox.objects.create(
+                user=user, subject=subject[:255], body_text=body_text, html_message=html,
+                click_url=items[0].click_url if len(items) == 1 else '',
+            )
+            NotificationOutbox.objects.filter(claimed_by=claim, status='digested').update(digest=digest, claimed_by='')
+        built += 1
+    return built
+
+
+def _claim_batch(limit: int) -> list[NotificationOutbox]:
+    now = timezone.now()
+    # rows left in 'sending' by a worker that died are picked up again
+    NotificationOutbox.objects.filter(
+        status='sending', claimed_at__lt=now - timedelta(seconds=CLAIM_TIMEOUT)
+    ).update(status='pending')
+    ids = list(
+        NotificationOutbox.objects.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    claim = uuid.uuid4().hex
+    NotificationOutbox.objects.filter(id__in=ids, status='pending').update(
+        status='sending', claimed_by=claim, claimed_at=now,
+    )
+    return list(NotificationOutbox.objects.select_related('user').filter(claimed_by=claim, status='sending'))
+
+
+def _deliver(item: NotificationOutbox, mailer):
+    from .notifications import _dispatch_user_notification
+    try:
+        ok = _dispatch_user_notification(
+            item.user, subject=item.subject, body_text=item.body_text,
+            html_message=item.html_message or None, click_url=item.click_url or None, mailer=mailer,
+        )
+        return ok, '' if ok else 'delivery failed'
+    except Exception as e:
+        return False, str(e) or e.__class__.__name__
+    finally:
+        # worker threads get their own DB connection; don't leak it
+        connection.close()
+
+
+def _channel(item: NotificationOutbox) -> str:
+    return getattr(item.user, 'notification_channel', 'email') or 'email'
+
+
+def drain_once(workers_per_channel: int | None = None, limit: int | None = None, mailer=None) -> dict:
+    """
+    Deliver one batch of due outbox rows. Returns counts of sent, retried and failed rows.
+    Emails go over `mailer` (an EmailBatch) if given, else over one connection for this batch.
+    """
+    from .notifications import EmailBatch
+    stats = {"sent": 0, "retry": 0, "failed": 0}
+    build_due_digests()
+    batch = _claim_batch(limit or BATCH_SIZE)
+    if not batch:
+        return stats
+    if mailer is None:
+        with EmailBatch() as mailer:
+            return _deliver_batch(batch, workers_per_channel, mailer, stats)
+    return _deliver_batch(batch, workers_per_channel, mailer, stats)
+
+
+def _release_tokens(items):
+    """
+    Free the dedupe tokens of events whose delivery finally failed so a later
+    check queues them again: SentNotification rows for Sonarr/Radarr events,
+    YTSentNotification rows (video_id in the context) for YouTube videos. The
+    feed's stored validators are cleared too, otherwise check_youtube would
+    skip the unchanged feed until the channel uploads again.
+    """
+    from .notifications import _release_sent_notifications
+    _release_sent_notifications([it.sent_notification_id for it in items if it.sent_notification_id])
+    videos, feeds = Q(), set()
+    for it in items:
+        ctx = it.context or {}
+        if ctx.get('video_id'):
+            videos |= Q(user_id=it.user_id, video_id=ctx['video_id'])
+            if ctx.get('feed_url'):
+                feeds.add(ctx['feed_url'])
+    if videos:
+        from youtube.models import YouTubeFeedState, YTSentNotification
+        try:
+            YTSentNotification.objects.filter(videos).delete()
+            YouTubeFeedState.objects.filter(feed_url__in=feeds).update(etag='', last_modified='', newest_video_id='')
+        except Exception:
+            logger.exception("Could not release YouTube notification tokens")
+
+
+def _deliver_batch(batch, workers_per_channel, mailer, stats) -> dict:
+    by_channel = {}
+    for item in batch:
+        by_channel.setdefault(_channel(item), []).append(item)
+    pools = {ch: ThreadPoolExecutor(max_workers=max(1, workers_per_channel or WORKERS_PER_CHANNEL),
+                                    thread_name_prefix=f"notify-{ch}") for ch in by_channel}
+    futures = [(item, pools[ch].submit(_deliver, item, mailer)) for ch, items in by_channel.items() for item in items]
+    for pool in pools.values():
+        pool.shutdown(wait=True)
+
+    # results are written from this thread only; SQLite does not like concurrent writers
+    now = timezone.now()
+    sent, failed = [], []
+    for item, fut in futures:
+        ok, error = fut.result()
+        if ok:
+            sent.append(item.pk)
+            continue
+        item.attempts += 1
+        item.last_error = error[:1000]
+        item.claimed_by = ''
+        if item.attempts >= MAX_ATTEMPTS:
+            item.status = 'failed'
+            failed.append(item)
+            stats["failed"] += 1
+        else:
+            item.status = 'pending'
+            item.next_attempt_at = now + timedelta(seconds=RETRY_BASE * 2 ** (item.attempts - 1))
+            stats["retry"] += 1
+        item.save(update_fields=['attempts', 'last_error', 'claimed_by', 'status', 'next_attempt_at'])
+    if sent:
+        NotificationOutbox.objects.filter(pk__in=sent).update(status='sent', sent_at=now, claimed_by='')
+        stats["sent"] = len(sent)
+    if failed:
+        # a failed digest releases the tokens of every event it carried
+        _release_tokens([*failed, *NotificationOutbox.objects.filter(digest__in=failed)])
+    return stats
+
+
+def purge_finished(now=None) -> int:
+    """Delete sent, digested and failed rows older than RETENTION_DAYS; returns the number deleted."""
+    if RETENTION_DAYS <= 0:
+        return 0
+    cutoff = (now or timezone.now()) - timedelta(days=RETENTION_DAYS)
+    deleted, _ = NotificationOutbox.objects.filter(
+        status__in=('sent', 'digested', 'failed'), created_at__lt=cutoff,
+    ).delete()
+    return deleted
+
+
+def drain_all(workers_per_channel: int | None = None) -> dict:
+    """Deliver batches until nothing is due any more (retries scheduled later are left alone)."""
+    from .notifications import EmailBatch
+    total = {"sent": 0, "retry": 0, "failed": 0}
+    with EmailBatch() as mailer:
+        while True:
+            stats = drain_once(workers_per_channel=workers_per_channel, mailer=mailer)
+            for k, v in stats.items():
+                total[k] += v
+            if not any(stats.values()):
+                break
+    try:
+        purge_finished()
+    except Exception:
+        logger.exception("Notification outbox cleanup failed")
+    return total
+
+
+def run_forever(interval: int | None = None, workers_per_channel: int | None = None,
+                stop: threading.Event | None = None):
+    interval = interval or POLL_INTERVAL
+    stop = stop or threading.Event()
+    last_purge = 0.0
+    while not stop.is_set():
+        try:
+            if time.monotonic() - last_purge >= PURGE_INTERVAL:
+                last_purge = time.monotonic()
+                purge_finished()
+            stats = drain_once(workers_per_channel=workers_per_channel)
+        except Exception:
+            logger.exception("Notification outbox drain failed")
+            stats = {}
+        finally:
+            close_old_connections()
+        if not any(stats.values()):
+            stop.wait(interval)
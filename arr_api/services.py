@@ -5,9 +5,14 @@ from datetime import datetime, timedelta, timezone
 from dateutil.parser import isoparse
 from settingspanel.models import ArrInstance
 from django.core.cache import cache
+from django.db import connection
 import hashlib
 import json
-from django.core.cache import cache
+import uuid
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from .client import arr_request, arr_get_json
+from .caching import swr_cached
 
 # ENV-Fallbacks
 ENV_SONARR_URL = os.getenv("SONARR_URL", "")
@@ -21,14 +26,16 @@ HAS4K_TTL = int(os.getenv("ARR_HAS4K_TTL", "300"))
 LOOKUP_TTL = int(os.getenv("ARR_LOOKUP_TTL", "300"))
 MOVIE_AVAIL_TTL = int(os.getenv("ARR_MOVIE_AVAIL_TTL", "300"))
 CAL_TTL = int(os.getenv("ARR_CAL_TTL", "120"))
+CAL_WINDOW_DAYS = int(os.getenv("ARR_CAL_WINDOW_DAYS", "60"))  # minimum horizon of the cached calendar window
+FANOUT_WORKERS = int(os.getenv("ARR_FANOUT_WORKERS", "8"))
+FANOUT_DEADLINE = float(os.getenv("ARR_FANOUT_DEADLINE", "4"))
 
 class ArrServiceError(Exception):
     pass
 
 def _get(url, headers, params=None, timeout=5):
     try:
-        r = requests.get(url, headers=headers, params=params or {}, timeout=timeout)
-        r.raise_for_status()
+        r = arr_request(url, headers.get("X-Api-Key", ""), params=params, timeout=timeout)
         try:
             return r.json()
         except ValueError as ve:
@@ -43,6 +50,72 @@ def _abs_url(base: str, p: str | None) -> str | None:
         return None
     return f"{base.rstrip('/')}" + p if p.startswith("/") else p
 
+def _poster_url(base: str, images) -> str | None:
+    # Poster finden
+    for img in (images or []):
+        if (img.get("coverType") or "").lower() == "poster":
+            poster = img.get("remoteUrl") or _abs_url(base, img.get("url"))
+            if poster:
+                return poster
+    return None
+
+SERIES_FIELDS = ("seriesId", "seriesTitle", "seriesStatus", "seriesPoster", "seriesOverview",
+                 "seriesGenres", "tvdbId", "imdbId", "network")
+
+def _sonarr_series_fields(base: str, series: dict) -> dict:
+    return {
+        "seriesId": series.get("id"),
+        "seriesTitle": series.get("title"),
+        "seriesStatus": (series.get("status") or "").lower(),
+        "seriesPoster": _poster_url(base, series.get("images")),
+        "seriesOverview": series.get("overview") or "",
+        "seriesGenres": series.get("genres") or [],
+        "tvdbId": series.get("tvdbId"),
+        "imdbId": series.get("imdbId"),
+        "network": series.get("network"),
+    }
+
+def _sonarr_episode_fields(ep: dict) -> dict:
+    return {
+        "episodeId": ep.get("id"),
+        "seasonNumber": ep.get("seasonNumber"),
+        "episodeNumber": ep.get("episodeNumber"),
+        "title": ep.get("title"),
+        "airDateUtc": isoparse(ep["airDateUtc"]).isoformat() if ep.get("airDateUtc") else None,
+    }
+
+def _sonarr_episode_row(base: str, ep: dict, series: dict) -> dict:
+    row = _sonarr_series_fields(base, series)
+    row.update(_sonarr_episode_fields(ep))
+    return row
+
+def _radarr_calendar_row(base: str, movie: dict) -> dict:
+    return {
+        "movieId": movie.get("id"),
+        "title": movie.get("title"),
+        "year": movie.get("year"),
+        "tmdbId": movie.get("tmdbId"),
+        "imdbId": movie.get("imdbId"),
+        "posterUrl": _poster_url(base, movie.get("images")),
+        "overview": movie.get("overview") or "",
+        "inCinemas": movie.get("inCinemas"),
+        "physicalRelease": movie.get("physicalRelease"),
+        "digitalRelease": movie.get("digitalRelease"),
+        "hasFile": movie.get("hasFile"),
+        "isAvailable": movie.get("isAvailable"),
+    }
+
+def _is_upcoming(m: dict) -> bool:
+    for k in ("inCinemas", "physicalRelease", "digitalRelease"):
+        v = m.get(k)
+        if v:
+            try:
+                if isoparse(v) > datetime.now(timezone.utc):
+                    return True
+            except Exception:
+                pass
+    return False
+
 def sonarr_calendar(days: int | None = None, base_url: str | None = None, api_key: str | None = None):
     base = (base_url or ENV_SONARR_URL).strip()
     key  = (api_key  or ENV_SONARR_KEY).strip()
@@ -61,34 +134,7 @@ def sonarr_calendar(days: int | None = None, base_url: str | None = None, api_ke
         "includeSeries": "true",
     })
 
-    out = []
-    for ep in data:
-        series = ep.get("series") or {}
-        # Poster finden
-        poster = None
-        for img in (series.get("images") or []):
-            if (img.get("coverType") or "").lower() == "poster":
-                poster = img.get("remoteUrl") or _abs_url(base, img.get("url"))
-                if poster:
-                    break
-
-        aired = isoparse(ep["airDateUtc"]).isoformat() if ep.get("airDateUtc") else None
-        out.append({
-            "seriesId": series.get("id"),
-            "seriesTitle": series.get("title"),
-            "seriesStatus": (series.get("status") or "").lower(),
-            "seriesPoster": poster,
-            "seriesOverview": series.get("overview") or "",
-            "seriesGenres": series.get("genres") or [],
-            "episodeId": ep.get("id"),
-            "seasonNumber": ep.get("seasonNumber"),
-            "episodeNumber": ep.get("episodeNumber"),
-            "title": ep.get("title"),
-            "airDateUtc": aired,
-            "tvdbId": series.get("tvdbId"),
-            "imdbId": series.get("imdbId"),
-            "network": series.get("network"),
-        })
+    out = [_sonarr_episode_row(base, ep, ep.get("series") or {}) for ep in data]
     return [x for x in out if x["seriesStatus"] == "continuing"]
 
 def radarr_calendar(days: int | None = None, base_url: str | None = None, api_key: str | None = None):
@@ -109,76 +155,165 @@ def radarr_calendar(days: int | None = None, base_url: str | None = None, api_ke
         "includeMovie": "true",
     })
 
-    out = []
-    for it in data:
-        movie = it.get("movie") or it
-        # Poster finden
-        poster = None
-        for img in (movie.get("images") or []):
-            if (img.get("coverType") or "").lower() == "poster":
-                poster = img.get("remoteUrl") or _abs_url(base, img.get("url"))
-                if poster:
-                    break
-
-        out.append({
-            "movieId": movie.get("id"),
-            "title": movie.get("title"),
-            "year": movie.get("year"),
-            "tmdbId": movie.get("tmdbId"),
-            "imdbId": movie.get("imdbId"),
-            "posterUrl": poster,
-            "overview": movie.get("overview") or "",
-            "inCinemas": movie.get("inCinemas"),
-            "physicalRelease": movie.get("physicalRelease"),
-            "digitalRelease": movie.get("digitalRelease"),
-            "hasFile": movie.get("hasFile"),
-            "isAvailable": movie.get("isAvailable"),
-        })
-
-    def is_upcoming(m):
-        for k in ("inCinemas", "physicalRelease", "digitalRelease"):
-            v = m.get(k)
-            if v:
-                try:
-                    if isoparse(v) > datetime.now(timezone.utc):
-                        return True
-                except Exception:
-                    pass
-        return False
+    out = [_radarr_calendar_row(base, it.get("movie") or it) for it in data]
+    return [m for m in out if _is_upcoming(m)]
 
-    return [m for m in out if is_upcoming(m)]
 
+def _calendar_horizon_key(inst: ArrInstance) -> str:
+    return f"arr:cal:v3:{inst.kind}:{inst.id}:horizon"
 
-def sonarr_calendar_cached(inst: ArrInstance, days: int) -> list[dict]:
-    """Cached Sonarr calendar per instance and days."""
-    if not inst or inst.kind != 'sonarr':
-        return []
-    key = f"arr:cal:v1:sonarr:{inst.id}:{int(days)}"
-    data = cache.get(key)
-    if data is not None:
-        return data
+
+def _calendar_horizon(inst: ArrInstance) -> int:
+    """Days the cached window for this instance covers (grows with the largest request)."""
+    return max(CAL_WINDOW_DAYS, int(cache.get(_calendar_horizon_key(inst)) or 0))
+
+
+def _parse_dt(value):
+    if not value:
+        return None
     try:
-        data = sonarr_calendar(days=days, base_url=inst.base_url, api_key=inst.api_key) or []
+        return isoparse(value)
     except Exception:
-        data = []
-    cache.set(key, data, CAL_TTL)
-    return data
+        return None
 
 
-def radarr_calendar_cached(inst: ArrInstance, days: int) -> list[dict]:
-    """Cached Radarr calendar per instance and days."""
+def _slice_episodes(items: list[dict], days: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    start, end = now.date(), (now + timedelta(days=days)).date()
+    out = []
+    for ep in items:
+        aired = _parse_dt(ep.get("airDateUtc"))
+        if aired is None or start <= aired.date() <= end:
+            out.append(ep)
+    return out
+
+
+def _slice_movies(items: list[dict], days: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    start, end = now.date(), (now + timedelta(days=days)).date()
+    out = []
+    for m in items:
+        dates = [_parse_dt(m.get(k)) for k in ("inCinemas", "physicalRelease", "digitalRelease")]
+        dates = [d for d in dates if d is not None]
+        if any(start <= d.date() <= end for d in dates) and any(d > now for d in dates):
+            out.append(m)
+    return out
+
+
+def _split_series(rows: list[dict]) -> tuple[dict, list[dict]]:
+    """Split flat Sonarr calendar rows into {seriesId: series fields} and lean episodes."""
+    series, episodes = {}, []
+    for r in rows:
+        sid = r.get("seriesId")
+        if sid not in series:
+            series[sid] = {k: r.get(k) for k in SERIES_FIELDS}
+        episodes.append({k: v for k, v in r.items() if k == "seriesId" or k not in SERIES_FIELDS})
+    return series, episodes
+
+
+@swr_cached(
+    key=lambda inst: f"arr:cal:v4:{inst.kind}:{inst.id}:window" if inst and inst.kind in ("sonarr", "radarr") else None,
+    ttl=CAL_TTL,
+)
+def _calendar_window_cached(inst: ArrInstance) -> dict:
+    """
+    One calendar fetch per instance covering the current horizon; callers slice it.
+    Sonarr windows keep series metadata once per series in "series" and lean
+    episodes (referencing seriesId) in "items".
+    """
+    days = _calendar_horizon(inst)
+    if inst.pk:
+        from .calendar_sync import sync_calendar
+        rows = sync_calendar(inst, days)
+    else:
+        # legacy single-instance settings have no row to sync against
+        fetch = sonarr_calendar if inst.kind == "sonarr" else radarr_calendar
+        rows = fetch(days=days, base_url=inst.base_url, api_key=inst.api_key) or []
+    if inst.kind == "sonarr":
+        series, rows = _split_series(rows)
+    else:
+        series = {}
+    return {"days": days, "series": series, "items": rows}
+
+
+def _calendar_cached(inst: ArrInstance, days: int, refresh: bool = False) -> tuple[dict, list[dict]]:
+    days = max(1, int(days or DEFAULT_DAYS))
+    window = _calendar_window_cached(inst, refresh=refresh)
+    if window["days"] < days:
+        # a longer horizon was asked for: remember it for a day and widen the window
+        cache.set(_calendar_horizon_key(inst), days, 86400)
+        window = _calendar_window_cached(inst, refresh=True)
+    slicer = _slice_episodes if inst.kind == "sonarr" else _slice_movies
+    return window["series"], slicer(window["items"], days)
+
+
+def sonarr_calendar_split_cached(inst: ArrInstance, days: int, refresh: bool = False) -> tuple[dict, list[dict]]:
+    """Sonarr calendar for the next `days` as ({seriesId: series fields}, lean episodes)."""
+    if not inst or inst.kind != 'sonarr':
+        return {}, []
+    return _calendar_cached(inst, days, refresh=refresh)
+
+
+def sonarr_calendar_cached(inst: ArrInstance, days: int, refresh: bool = False) -> list[dict]:
+    """Sonarr calendar for the next `days` as flat rows (series fields copied into each episode)."""
+    series, episodes = sonarr_calendar_split_cached(inst, days, refresh=refresh)
+    return [{**series.get(e["seriesId"], {}), **e} for e in episodes]
+
+
+def radarr_calendar_cached(inst: ArrInstance, days: int, refresh: bool = False) -> list[dict]:
+    """Radarr calendar for the next `days`, sliced from the cached per-instance window."""
     if not inst or inst.kind != 'radarr':
         return []
-    key = f"arr:cal:v1:radarr:{inst.id}:{int(days)}"
-    data = cache.get(key)
-    if data is not None:
-        return data
+    return _calendar_cached(inst, days, refresh=refresh)[1]
+
+
+def _in_worker(fn, *args):
+    # pool threads open their own DB connection for the calendar sync; close it when done
     try:
-        data = radarr_calendar(days=days, base_url=inst.base_url, api_key=inst.api_key) or []
-    except Exception:
-        data = []
-    cache.set(key, data, CAL_TTL)
-    return data
+        return fn(*args)
+    finally:
+        connection.close()
+
+
+def fetch_calendars_concurrently(instances: list[ArrInstance], days: int, deadline: float | None = None):
+    """
+    Fetch cached Sonarr/Radarr calendars for all instances in parallel.
+    Returns (episodes, series, movies, errors): episodes are lean and carry the
+    instanceId they came from, series maps (instanceId, seriesId) to its metadata
+    (series ids are only unique within one Sonarr), errors is a list
+    of (instance, message) for instances that failed or did not answer within
+    the deadline. Slow fetches keep running in the background and still fill the cache.
+    """
+    eps, series, movies, errors = [], {}, [], []
+    instances = [i for i in instances if i.kind in ("sonarr", "radarr")]
+    if not instances:
+        return eps, series, movies, errors
+    pool = ThreadPoolExecutor(max_workers=max(1, min(FANOUT_WORKERS, len(instances))))
+    futures = {}
+    for inst in instances:
+        fn = sonarr_calendar_split_cached if inst.kind == "sonarr" else radarr_calendar_cached
+        futures[pool.submit(_in_worker, fn, inst, days)] = inst
+    done, _pending = wait(futures, timeout=FANOUT_DEADLINE if deadline is None else deadline)
+    pool.shutdown(wait=False)
+    # keep instance order stable regardless of completion order
+    for fut, inst in futures.items():
+        if fut not in done:
+            errors.append((inst, "timed out"))
+            continue
+        try:
+            data = fut.result()
+        except Exception as e:
+            errors.append((inst, str(e)))
+            continue
+        if inst.kind == "sonarr":
+            table, data = data
+            for sid, fields in table.items():
+                series[(inst.id, sid)] = fields
+            eps.extend({**e, "instanceId": inst.id} for e in data)
+        else:
+            movies.extend(data or [])
+    return eps, series, movies, errors
+
 
 def sonarr_get_series(series_id: int, base_url: str | None = None, api_key: str | None = None) -> dict | None:
     """Fetch a single series by id from Sonarr, return dict with title, overview, poster and genres."""
@@ -275,25 +410,139 @@ def radarr_lookup_movie_by_tmdb_id(tmdb_id: int, base_url: str | None = None, ap
 
 
 def _radarr_get(base: str, key: str, path: str, params: dict | None = None):
-    if not base or not key:
-        return None
-    url = f"{base.rstrip('/')}{path}"
-    try:
-        r = requests.get(url, headers={"X-Api-Key": key}, params=params or {}, timeout=8)
-        r.raise_for_status()
-        return r.json()
-    except requests.RequestException:
-        return None
+    return arr_get_json(base, key, path, params=params, timeout=8)
+
+
+class LibraryEntry(NamedTuple):
+    """Compact per-movie record of a Radarr library index."""
+    id: int | None
+    has_file: bool
+    is_available: bool
+    has4k: bool
+
+
+# Slim projection of one /api/v3/movie item as stored in the movie list cache.
+# Plain tuples unpickle several times faster than dicts or namedtuples.
+MOVIE_ROW_FIELDS = (
+    'id', 'tmdb_id', 'title', 'year', 'poster', 'overview',
+    'has_file', 'is_available',
+    'file_4k',  # None: hasFile but no embedded movieFile to inspect
+)
+
+
+def _movie_row(base: str, m: dict) -> tuple:
+    poster = None
+    for img in (m.get('images') or []):
+        if (img.get('coverType') or '').lower() == 'poster':
+            poster = img.get('remoteUrl') or _abs_url(base, img.get('url'))
+            if poster:
+                break
+    mf = m.get('movieFile') or {}
+    has_file = bool(m.get('hasFile') or mf)
+    if mf:
+        file_4k = _file_is_4k(mf)
+    else:
+        file_4k = None if has_file else False
+    return (
+        m.get('id'), m.get('tmdbId'), m.get('title'), m.get('year'), poster,
+        m.get('overview') or '', has_file, bool(m.get('isAvailable')), file_4k,
+    )
+
+
+def _empty_movie_list() -> tuple[str, list]:
+    return "", []
+
+
+def _movie_list_stamp_key(inst: ArrInstance) -> str:
+    return f"arr:radarr:v4:{inst.id}:movie_list_stamp"
+
+
+@swr_cached(key=lambda inst: f"arr:radarr:v4:{inst.id}:movie_list", ttl=RADARR_LIST_TTL, default=_empty_movie_list)
+def _radarr_movie_list_entry(inst: ArrInstance) -> tuple[str, list[tuple]]:
+    """
+    (stamp, rows): the /api/v3/movie list of an instance projected to
+    MOVIE_ROW_FIELDS tuples, cached for RADARR_LIST_TTL. The stamp identifies
+    one fetch; it is empty for the default returned after a failed cold fetch.
+    It is also stored alone under a small key that lives as long as the list
+    is fresh, so index lookups need not unpickle the list to check it.
+    """
+    raw = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie")
+    if raw is None:
+        raise ArrServiceError(f"Radarr ({inst.name}) movie list unavailable")
+    stamp = uuid.uuid4().hex
+    cache.set(_movie_list_stamp_key(inst), stamp, RADARR_LIST_TTL)
+    return stamp, [_movie_row(inst.base_url, m) for m in raw]
+
+
+def _radarr_movie_list_cached(inst: ArrInstance, refresh: bool = False) -> list[tuple]:
+    return _radarr_movie_list_entry(inst, refresh=refresh)[1]
+
+
+# instance id -> (movie list stamp, library index); rebuilt whenever the cached list was refetched
+_library_memo: dict = {}
+
+
+def _build_library_snapshot(inst: ArrInstance, movies: list[tuple]) -> dict[int, LibraryEntry]:
+    """
+    Index the movie list by tmdbId -> LibraryEntry.
+    Movies that report hasFile without an embedded movieFile are resolved with
+    bulk /api/v3/moviefile?movieId=... requests instead of one call per movie.
+    """
+    snap: dict[int, dict] = {}
+    missing: dict[int, int] = {}  # movie id -> tmdbId
+    for mid, tmdb, _title, _year, _poster, _overview, has_file, is_available, file_4k in movies:
+        if not tmdb:
+            continue
+        cur = snap.get(tmdb) or {'id': mid, 'has_file': False, 'is_available': False, 'has4k': False}
+        cur['has_file'] = cur['has_file'] or has_file
+        cur['is_available'] = cur['is_available'] or is_available
+        if file_4k:
+            cur['has4k'] = True
+        elif file_4k is None and mid:
+            missing[mid] = tmdb
+        snap[tmdb] = cur
+    ids = list(missing)
+    for i in range(0, len(ids), 100):
+        files = _radarr_get(inst.base_url, inst.api_key, "/api/v3/moviefile", params={"movieId": ids[i:i + 100]}) or []
+        for f in files:
+            tmdb = missing.get(f.get('movieId'))
+            if tmdb and _file_is_4k(f):
+                snap[tmdb]['has4k'] = True
+    return {tmdb: LibraryEntry(**v) for tmdb, v in snap.items()}
+
+
+def _library_for_entry(inst: ArrInstance, stamp: str, movies: list[tuple]) -> dict[int, LibraryEntry]:
+    if not stamp:
+        return {}
+    memo = _library_memo.get(inst.id)
+    if memo is not None and memo[0] == stamp:
+        return memo[1]
+    snap = _build_library_snapshot(inst, movies)
+    _library_memo[inst.id] = (stamp, snap)
+    return snap
+
+
+def radarr_library_snapshot(inst: ArrInstance) -> dict[int, LibraryEntry]:
+    """
+    tmdbId -> LibraryEntry index for one Radarr instance, built from the cached
+    movie list and memoised per process on that list's stamp, so it expires
+    with the list entry and is never kept from a failed fetch. The list itself
+    is only loaded when the stamp key is gone or names a different fetch.
+    """
+    memo = _library_memo.get(inst.id)
+    if memo is not None and memo[0] == cache.get(_movie_list_stamp_key(inst)):
+        return memo[1]
+    return _library_for_entry(inst, *_radarr_movie_list_entry(inst))
 
 
 def list_movies_missing_4k_across_instances() -> list[dict]:
     """
     Return unique movies known to Radarr instances that do NOT have any 4K file across all enabled Radarr instances.
-    Uses qualityProfile/hasFile + mediaInfo.videoCodec/width heuristics.
+    4K detection comes from the per-instance library snapshot (quality name / mediaInfo width heuristics).
     Output entries: { tmdbId, title, year, poster, overview }
     """
     movies_by_tmdb: dict[int, dict] = {}
-    instances = list(ArrInstance.objects.filter(enabled=True, kind='radarr').order_by('order','id'))
+    instances = ArrInstance.enabled_instances('radarr')
 
     # Cache the aggregated list per instances fingerprint
     def _fp(insts: list[ArrInstance]) -> str:
@@ -314,40 +563,26 @@ def list_movies_missing_4k_across_instances() -> list[dict]:
     if cached is not None:
         return cached
     for inst in instances:
-        # pull all movies; may be heavy for big libs, but acceptable MVP
-        list_key = f"arr:radarr:v1:{inst.id}:movie_list"
-        data = cache.get(list_key)
-        if data is None:
-            data = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie") or []
-            cache.set(list_key, data, RADARR_LIST_TTL)
-        for m in data:
-            tmdb = m.get('tmdbId')
+        stamp, data = _radarr_movie_list_entry(inst)
+        library = _library_for_entry(inst, stamp, data)
+        for _mid, tmdb, title, year, poster, overview, *_flags in data:
             if not tmdb:
                 continue
             cur = movies_by_tmdb.get(tmdb)
             if not cur:
                 # Keep basic fields and availability flags
-                poster = None
-                for img in (m.get('images') or []):
-                    if (img.get('coverType') or '').lower() == 'poster':
-                        poster = img.get('remoteUrl') or _abs_url(inst.base_url, img.get('url'))
-                        if poster:
-                            break
                 cur = {
                     'tmdbId': tmdb,
-                    'title': m.get('title'),
-                    'year': m.get('year'),
+                    'title': title,
+                    'year': year,
                     'poster': poster,
-                    'overview': m.get('overview') or '',
+                    'overview': overview,
                     '_has4k': False,
                 }
-            # Check 4K availability for this movie in this instance (cached)
-            mid = m.get('id')
-            try:
-                if mid and _movie_has_4k_in_instance_cached(inst, mid):
-                    cur['_has4k'] = True
-            except Exception:
-                pass
+            # 4K availability for this movie in this instance from the library snapshot
+            entry = library.get(tmdb)
+            if entry and entry.has4k:
+                cur['_has4k'] = True
             movies_by_tmdb[tmdb] = cur
     # Return only those that do not have 4K anywhere
     result = [v for v in movies_by_tmdb.values() if not v.get('_has4k')]
@@ -355,11 +590,23 @@ def list_movies_missing_4k_across_instances() -> list[dict]:
     return result
 
 
+def _file_is_4k(f: dict) -> bool:
+    # Heuristics for 4K: either width >= 3800 or quality name includes '2160p'/'UHD'/'4K'
+    try:
+        width = int((f.get('mediaInfo') or {}).get('width') or 0)
+    except Exception:
+        width = 0
+    qname = (((f.get('quality') or {}).get('quality') or {}).get('name') or '').lower()
+    return width >= 3800 or any(k in qname for k in ('2160p','uhd','4k'))
+
+
 def _movie_has_4k_in_instance(base_url: str, api_key: str, movie_id: int) -> bool:
     if not base_url or not api_key or not movie_id:
         return False
     # Fetch movie file(s) to inspect resolution/mediainfo
-    movie_obj = _radarr_get(base_url, api_key, f"/api/v3/movie/{movie_id}") or {}
+    movie_obj = _radarr_get(base_url, api_key, f"/api/v3/movie/{movie_id}")
+    if movie_obj is None:
+        raise ArrServiceError(f"Radarr movie {movie_id} unavailable")
     mf = movie_obj.get('movieFile') or {}
     files_list = None
     if not mf:
@@ -369,56 +616,46 @@ def _movie_has_4k_in_instance(base_url: str, api_key: str, movie_id: int) -> boo
         files_list = [mf]
     if not files_list:
         return False
-    # Heuristics for 4K: either width >= 3800 or quality name includes '2160p'/'UHD'/'4K'
-    for f in files_list:
-        try:
-            width = int((f.get('mediaInfo') or {}).get('width') or 0)
-        except Exception:
-            width = 0
-        qname = (((f.get('quality') or {}).get('quality') or {}).get('name') or '').lower()
-        if width >= 3800 or any(k in qname for k in ('2160p','uhd','4k')):
-            return True
-    return False
+    return any(_file_is_4k(f) for f in files_list)
 
 
+@swr_cached(
+    key=lambda inst, movie_id: f"arr:radarr:v2:{inst.id}:has4k:{movie_id}" if inst and movie_id else None,
+    ttl=HAS4K_TTL,
+    default=False,
+)
 def _movie_has_4k_in_instance_cached(inst: ArrInstance, movie_id: int) -> bool:
     if not inst or not movie_id:
         return False
-    key = f"arr:radarr:v1:{inst.id}:has4k:{movie_id}"
-    val = cache.get(key)
-    if val is not None:
-        return bool(val)
-    ok = _movie_has_4k_in_instance(inst.base_url, inst.api_key, movie_id)
-    cache.set(key, bool(ok), HAS4K_TTL)
-    return ok
+    return bool(_movie_has_4k_in_instance(inst.base_url, inst.api_key, movie_id))
+
+
+@swr_cached(
+    key=lambda inst, tmdb_id: f"arr:radarr:v2:{inst.id}:lookup:tmdb:{tmdb_id}" if inst and tmdb_id else None,
+    ttl=LOOKUP_TTL,
+    default=list,
+)
+def _lookup_tmdb_cached(inst: ArrInstance, tmdb_id: int) -> list[dict]:
+    if not inst or not tmdb_id:
+        return []
+    data = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie/lookup", params={"term": f"tmdb:{tmdb_id}"})
+    if data is None:
+        raise ArrServiceError(f"Radarr ({inst.name}) lookup of tmdb:{tmdb_id} unavailable")
+    return data
 
 
 def tmdb_has_4k_any_instance(tmdb_id: int) -> bool:
     """Check if any enabled Radarr instance has a 4K file for a movie with this TMDB id."""
-    instances = list(ArrInstance.objects.filter(enabled=True, kind='radarr').order_by('order','id'))
+    instances = ArrInstance.enabled_instances('radarr')
     for inst in instances:
-        # Lookup by TMDB id on this instance
-        data = None
-        # Try to use cached full list first
-        list_key = f"arr:radarr:v1:{inst.id}:movie_list"
-        full = cache.get(list_key)
-        if full is None:
-            full = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie") or []
-            cache.set(list_key, full, RADARR_LIST_TTL)
-        # Filter for tmdb match in library
-        data = [m for m in (full or []) if m.get('tmdbId') == tmdb_id]
-        # If not found in library, fallback to lookup (cached)
-        if not data:
-            lk = f"arr:radarr:v1:{inst.id}:lookup:tmdb:{tmdb_id}"
-            data = cache.get(lk)
-            if data is None:
-                data = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie/lookup", params={"term": f"tmdb:{tmdb_id}"}) or []
-                cache.set(lk, data, LOOKUP_TTL)
-        # If not found via lookup, try full list as fallback
-        if not data:
-            data = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie") or []
-        for m in data:
-            if m.get('tmdbId') == tmdb_id:
+        entry = radarr_library_snapshot(inst).get(tmdb_id)
+        if entry:
+            if entry.has4k:
+                return True
+            continue
+        # Not in the (possibly stale) library index: fallback to lookup (cached)
+        for m in _lookup_tmdb_cached(inst, tmdb_id):
+            if m.get('tmdbId') == tmdb_id and m.get('id'):
                 if _movie_has_4k_in_instance_cached(inst, m.get('id')):
                     return True
     return False
@@ -430,47 +667,38 @@ def _movie_is_available_in_instance(base_url: str, api_key: str, movie_id: int)
     """Check if a Radarr movie has an available file in this instance."""
     if not base_url or not api_key or not movie_id:
         return False
-    movie_obj = _radarr_get(base_url, api_key, f"/api/v3/movie/{movie_id}") or {}
+    movie_obj = _radarr_get(base_url, api_key, f"/api/v3/movie/{movie_id}")
+    if movie_obj is None:
+        raise ArrServiceError(f"Radarr movie {movie_id} unavailable")
     if movie_obj.get('hasFile') or movie_obj.get('isAvailable'):
         return True
     # Fallback: explicit moviefile query
     files_list = _radarr_get(base_url, api_key, f"/api/v3/moviefile", params={"movieId": movie_id}) or []
     return bool(files_list)
 
+@swr_cached(
+    key=lambda inst, movie_id: f"arr:radarr:v2:{inst.id}:hasfile:{movie_id}" if inst and movie_id else None,
+    ttl=MOVIE_AVAIL_TTL,
+    default=False,
+)
 def _movie_is_available_in_instance_cached(inst: ArrInstance, movie_id: int) -> bool:
     if not inst or not movie_id:
         return False
-    key = f"arr:radarr:v1:{inst.id}:hasfile:{movie_id}"
-    val = cache.get(key)
-    if val is not None:
-        return bool(val)
-    ok = _movie_is_available_in_instance(inst.base_url, inst.api_key, movie_id)
-    cache.set(key, bool(ok), MOVIE_AVAIL_TTL)
-    return ok
+    return bool(_movie_is_available_in_instance(inst.base_url, inst.api_key, movie_id))
 
 def tmdb_is_available_any_instance(tmdb_id: int) -> bool:
     """True if any enabled Radarr instance has the movie (tmdb_id) with a downloaded/available file."""
     if not tmdb_id:
         return False
-    instances = list(ArrInstance.objects.filter(enabled=True, kind='radarr').order_by('order','id'))
+    instances = ArrInstance.enabled_instances('radarr')
     for inst in instances:
-        # Try cached full list first
-        list_key = f"arr:radarr:v1:{inst.id}:movie_list"
-        full = cache.get(list_key)
-        if full is None:
-            full = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie") or []
-            cache.set(list_key, full, RADARR_LIST_TTL)
-        data = [m for m in (full or []) if m.get('tmdbId') == tmdb_id]
-        if not data:
-            # Fallback to lookup
-            lk = f"arr:radarr:v1:{inst.id}:lookup:tmdb:{tmdb_id}"
-            data = cache.get(lk)
-            if data is None:
-                data = _radarr_get(inst.base_url, inst.api_key, "/api/v3/movie/lookup", params={"term": f"tmdb:{tmdb_id}"}) or []
-                cache.set(lk, data, LOOKUP_TTL)
-        if not data:
+        entry = radarr_library_snapshot(inst).get(tmdb_id)
+        if entry:
+            if entry.has_file or entry.is_available:
+                return True
             continue
-        for m in data:
+        # Not in the (possibly stale) library index: fallback to lookup (cached)
+        for m in _lookup_tmdb_cached(inst, tmdb_id):
             if m.get('tmdbId') == tmdb_id:
                 mid = m.get('id')
                 if mid and _movie_is_available_in_instance_cached(inst, mid):
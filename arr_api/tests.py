@@ -1,3 +1,733 @@
-from django.test import TestCase
+import smtplib
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from settingspanel.models import ArrInstance
+
+from . import caching, calendar_sync, notifications, outbox, services, warmer
+from .models import CalendarItem, CalendarSyncState, NotificationOutbox
+
+
+class SwrCachedTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+        self.result = "v1"
+
+        @caching.swr_cached(key=lambda name: f"test:swr:{name}", ttl=60)
+        def fetch(name):
+            self.calls.append(name)
+            if isinstance(self.result, Exception):
+                raise self.result
+            return self.result
+
+        self.fetch = fetch
+
+    def _expire(self, name="a"):
+        value, _soft, error = cache.get(f"test:swr:{name}")
+        cache.set(f"test:swr:{name}", (value, 0, error), 600)
+
+    def test_fresh_value_is_served_from_cache(self):
+        self.assertEqual(self.fetch("a"), "v1")
+        self.result = "v2"
+        self.assertEqual(self.fetch("a"), "v1")
+        self.assertEqual(len(self.calls), 1)
+
+    def test_stale_value_is_served_while_another_caller_refreshes(self):
+        self.fetch("a")
+        self._expire()
+        self.result = "v2"
+        cache.add("test:swr:a:lock", 1, 30)
+        self.assertEqual(self.fetch("a"), "v1")
+        self.assertEqual(len(self.calls), 1)
+        cache.delete("test:swr:a:lock")
+        self.assertEqual(self.fetch("a"), "v2")
+
+    def test_failed_refresh_keeps_last_good_value(self):
+        self.fetch("a")
+        self._expire()
+        self.result = RuntimeError("down")
+        self.assertEqual(self.fetch("a"), "v1")
+        self.assertEqual(self.fetch("a"), "v1")
+        # retried only after ERROR_TTL
+        self.assertEqual(len(self.calls), 2)
+
+    def test_cold_error_is_cached_for_error_ttl(self):
+        self.result = RuntimeError("down")
+        with self.assertRaises(caching.CachedUpstreamError):
+            self.fetch("a")
+        self.result = "v1"
+        with self.assertRaises(caching.CachedUpstreamError):
+            self.fetch("a")
+        self.assertEqual(len(self.calls), 1)
+
+    def test_cold_key_is_fetched_once_by_concurrent_callers(self):
+        started, release = threading.Event(), threading.Event()
+
+        @caching.swr_cached(key=lambda: "test:swr:slow", ttl=60)
+        def slow():
+            self.calls.append("slow")
+            started.set()
+            release.wait(5)
+            return "done"
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(slow()))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(slow()))
+        second.start()
+        release.set()
+        first.join(5)
+        second.join(5)
+        self.assertEqual(results, ["done", "done"])
+        self.assertEqual(self.calls, ["slow"])
+
+    def test_refresh_skips_while_another_caller_refreshes(self):
+        self.fetch("a")
+        self.result = "v2"
+        cache.add("test:swr:a:lock", 1, 30)
+        self.assertEqual(self.fetch("a", refresh=True), "v1")
+        self.assertEqual(len(self.calls), 1)
+        cache.delete("test:swr:a:lock")
+        self.assertEqual(self.fetch("a", refresh=True), "v2")
+
+    def test_failure_does_not_overwrite_a_value_stored_meanwhile(self):
+        @caching.swr_cached(key=lambda: "test:swr:race", ttl=60)
+        def racing():
+            # another caller (e.g. a request racing the warmer) stores a good value first
+            caching._store("test:swr:race", "fresh", 60)
+            raise RuntimeError("down")
+
+        self.assertEqual(racing(), "fresh")
+        cache.clear()
+        with self.assertRaises(RuntimeError):
+            racing(refresh=True)
+        self.assertEqual(cache.get("test:swr:race")[0], "fresh")
+        self.assertIsNone(cache.get("test:swr:race")[2])
+
+
+class FetchCalendarsConcurrentlyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.a = ArrInstance.objects.create(kind="sonarr", name="A", base_url="http://a", api_key="k")
+        self.b = ArrInstance.objects.create(kind="sonarr", name="B", base_url="http://b", api_key="k")
+
+    def test_series_table_is_keyed_per_instance(self):
+        def split(inst, days):
+            title = "ShowA" if inst.pk == self.a.pk else "ShowB"
+            ep = 100 if inst.pk == self.a.pk else 200
+            return {1: {"seriesId": 1, "seriesTitle": title}}, [{"seriesId": 1, "episodeId": ep}]
+
+        with mock.patch.object(services, "sonarr_calendar_split_cached", side_effect=split):
+            eps, series, movies, errors = services.fetch_calendars_concurrently([self.a, self.b], 7)
+
+        self.assertEqual(errors, [])
+        titles = {e["episodeId"]: series[(e["instanceId"], e["seriesId"])]["seriesTitle"] for e in eps}
+        self.assertEqual(titles, {100: "ShowA", 200: "ShowB"})
+
+    def test_worker_threads_close_their_db_connection(self):
+        split = mock.Mock(return_value=({}, []))
+        with mock.patch.object(services, "sonarr_calendar_split_cached", split), \
+                mock.patch.object(services, "connection") as conn:
+            errors = services.fetch_calendars_concurrently([self.a, self.b], 7)[3]
+        self.assertEqual(errors, [])
+        self.assertEqual(conn.close.call_count, 2)
+
+
+
+class CalendarWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sonarr = ArrInstance.objects.create(kind="sonarr", name="S", base_url="http://s", api_key="k")
+        self.radarr = ArrInstance.objects.create(kind="radarr", name="R", base_url="http://r", api_key="k")
+        noon = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+        def day(d):
+            return (noon + timedelta(days=d)).isoformat()
+
+        self.series = {1: {"id": 1, "title": "Running", "status": "continuing"},
+                       2: {"id": 2, "title": "Ended", "status": "ended"}}
+        self.episodes = [
+            {"id": 1000 + d, "seriesId": 1 + d % 2, "seasonNumber": 1, "episodeNumber": d, "title": f"Ep {d}",
+             "airDateUtc": day(d)}
+            for d in range(0, 100, 3)
+        ]
+        self.movies = [
+            {"id": 1, "tmdbId": 11, "title": "Soon", "inCinemas": day(5)},
+            {"id": 2, "tmdbId": 12, "title": "Digital later", "inCinemas": day(-40), "digitalRelease": day(45)},
+            {"id": 3, "tmdbId": 13, "title": "Disc", "physicalRelease": day(75)},
+            {"id": 4, "tmdbId": 14, "title": "Past", "inCinemas": day(-10)},
+            {"id": 5, "tmdbId": 15, "title": "Edge", "digitalRelease": day(31)},
+        ]
+        self.calls = []
+        for module in (services, calendar_sync):
+            patcher = mock.patch.object(module, "_get", side_effect=self._upstream)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _upstream(self, url, headers, params=None, timeout=5):
+        self.calls.append(url)
+        start, end = (timezone.datetime.fromisoformat(params[k]).date() for k in ("start", "end"))
+
+        def within(value):
+            return value and start <= timezone.datetime.fromisoformat(value).date() <= end
+
+        if "includeMovie" in params:
+            return [m for m in self.movies if any(within(m.get(k)) for k in ("inCinemas", "physicalRelease", "digitalRelease"))]
+        full = params.get("includeSeries") == "true"
+        return [{**ep, "series": self.series[ep["seriesId"]]} if full else dict(ep)
+                for ep in self.episodes if within(ep["airDateUtc"])]
+
+    def test_horizons_within_the_window_share_one_fetch(self):
+        for days in (30, 31, 60):
+            services.sonarr_calendar_cached(self.sonarr, days)
+            services.radarr_calendar_cached(self.radarr, days)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_longer_horizon_widens_the_window_once(self):
+        services.sonarr_calendar_cached(self.sonarr, 30)
+        self.calls.clear()
+        self.assertEqual(len(services.sonarr_calendar_cached(self.sonarr, 90)), 16)
+        widened = len(self.calls)
+        for days in (90, 75, 30):
+            services.sonarr_calendar_cached(self.sonarr, days)
+        self.assertGreater(widened, 0)
+        self.assertEqual(len(self.calls), widened)
+
+    def test_slices_match_direct_calendar_calls(self):
+        expected_movies = {7: [1], 30: [1], 31: [1, 5], 60: [1, 2, 5], 90: [1, 2, 3, 5]}
+        for days, movie_ids in expected_movies.items():
+            cached = services.sonarr_calendar_cached(self.sonarr, days)
+            direct = services.sonarr_calendar(days=days, base_url="http://s", api_key="k")
+            self.assertTrue(cached)
+            self.assertEqual(sorted(cached, key=lambda r: r["episodeId"]), sorted(direct, key=lambda r: r["episodeId"]))
+            cached = services.radarr_calendar_cached(self.radarr, days)
+            direct = services.radarr_calendar(days=days, base_url="http://r", api_key="k")
+            self.assertEqual(sorted(m["movieId"] for m in cached), movie_ids)
+            self.assertEqual(sorted(cached, key=lambda m: m["movieId"]), sorted(direct, key=lambda m: m["movieId"]))
+
+
+class CalendarSyncTests(TestCase):
+    def setUp(self):
+        self.inst = ArrInstance.objects.create(kind="sonarr", name="S", base_url="http://s", api_key="k")
+        now = timezone.now().replace(hour=20, minute=0, second=0, microsecond=0)
+        self.series = {"id": 7, "title": "Show", "status": "continuing"}
+        self.episodes = [
+            {"id": 100 + d, "seriesId": 7, "seasonNumber": 1, "episodeNumber": d + 1, "title": f"Ep {d + 1}",
+             "airDateUtc": (now + timedelta(days=d)).isoformat()}
+            for d in range(20)
+        ]
+        self.calls = []
+
+    def _fetch(self, inst, start, end, full=True):
+        self.calls.append((start, end, full))
+        out = []
+        for ep in self.episodes:
+            if start <= timezone.datetime.fromisoformat(ep["airDateUtc"]).date() <= end:
+                out.append({**ep, "series": self.series} if full else dict(ep))
+        return out
+
+    def _sync(self, days):
+        self.calls = []
+        with mock.patch.object(calendar_sync, "_fetch", side_effect=self._fetch):
+            return calendar_sync.sync_calendar(self.inst, days)
+
+    def test_first_sync_is_full(self):
+        rows = self._sync(10)
+        self.assertEqual([full for _s, _e, full in self.calls], [True])
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[0]["seriesTitle"], "Show")
+        self.assertIsNotNone(CalendarSyncState.objects.get(instance=self.inst).last_full_sync)
+
+    def test_delta_sync_rewrites_only_changed_rows(self):
+        self._sync(10)
+        before = dict(CalendarItem.objects.values_list("item_id", "updated_at"))
+        self.episodes[3]["title"] = "Renamed"
+        del self.episodes[5]
+        rows = self._sync(10)
+        # only the known window is re-checked, without series payloads
+        self.assertEqual([full for _s, _e, full in self.calls], [False])
+        after = dict(CalendarItem.objects.values_list("item_id", "updated_at"))
+        self.assertNotIn(105, after)
+        self.assertNotEqual(before[103], after[103])
+        self.assertEqual(before[101], after[101])
+        renamed = next(r for r in rows if r["episodeId"] == 103)
+        self.assertEqual((renamed["title"], renamed["seriesTitle"]), ("Renamed", "Show"))
+
+    def test_longer_window_fetches_only_the_new_tail_in_full(self):
+        self._sync(10)
+        rows = self._sync(15)
+        self.assertEqual([full for _s, _e, full in self.calls], [False, True])
+        self.assertEqual(self.calls[1][0], timezone.now().date() + timedelta(days=10))
+        self.assertEqual(len(rows), 16)
+
+    def test_full_sync_again_after_interval(self):
+        self._sync(10)
+        CalendarSyncState.objects.update(last_full_sync=timezone.now() - timedelta(seconds=calendar_sync.CAL_FULL_SYNC_INTERVAL + 1))
+        self._sync(10)
+        self.assertEqual([full for _s, _e, full in self.calls], [True])
+
+    def test_concurrent_syncs_of_one_instance(self):
+        # a second sync (e.g. the warmer's refresh) finishes while the first is still fetching
+        def fetch(inst, start, end, full=True):
+            if not nested:
+                nested.append(None)
+                nested[0] = calendar_sync.sync_calendar(inst, 10)
+            return self._fetch(inst, start, end, full)
+
+        nested = []
+        with mock.patch.object(calendar_sync, "_fetch", side_effect=fetch):
+            rows = calendar_sync.sync_calendar(self.inst, 10)
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(len(nested[0]), 11)
+        self.assertEqual(CalendarItem.objects.filter(instance=self.inst).count(), 11)
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="digest", email="d@example.com", notification_digest="hourly")
+
+    def _hold(self, n, age_hours=2):
+        outbox.enqueue_notifications([{'user': self.user, 'subject': f"Event {i}", 'body_text': f"Body {i}"} for i in range(n)])
+        NotificationOutbox.objects.update(created_at=timezone.now() - timedelta(hours=age_hours))
+
+    def test_due_events_are_folded_into_one_digest(self):
+        self._hold(3)
+        self.assertEqual(outbox.build_due_digests(), 1)
+        digest = NotificationOutbox.objects.get(status='pending')
+        self.assertEqual(digest.subject, "3 new releases")
+        self.assertEqual(digest.digest_items.filter(status='digested').count(), 3)
+        self.assertEqual(outbox.build_due_digests(), 0)
+
+    def test_events_not_due_yet_stay_held(self):
+        self._hold(2, age_hours=0)
+        self.assertEqual(outbox.build_due_digests(), 0)
+        self.assertEqual(NotificationOutbox.objects.filter(status='held').count(), 2)
+
+    def test_concurrent_build_does_not_digest_the_same_events_twice(self):
+        self._hold(2)
+        real = notifications.render_digest
+        inner = []
+
+        def render_and_race(user, items):
+            # a second drain running while the first renders finds nothing left to claim
+            inner.append(outbox.build_due_digests())
+            return real(user, items)
+
+        with mock.patch.object(notifications, "render_digest", side_effect=render_and_race):
+            self.assertEqual(outbox.build_due_digests(), 1)
+        self.assertEqual(inner, [0])
+        self.assertEqual(NotificationOutbox.objects.filter(status='pending').count(), 1)
+
+
+class OutboxDeliveryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="outbox", email="o@example.com")
+
+    def _drain(self, ok):
+        with mock.patch.object(notifications, "_dispatch_user_notification", return_value=ok):
+            return outbox.drain_once(mailer=mock.Mock())
+
+    def test_delivered_rows_are_marked_sent(self):
+        row = outbox.enqueue_notification(self.user, "Hello", "body")
+        self.assertEqual(self._drain(True), {"sent": 1, "retry": 0, "failed": 0})
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'sent')
+        self.assertIsNotNone(row.sent_at)
+        self.assertEqual(self._drain(True)["sent"], 0)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        row = outbox.enqueue_notification(self.user, "Hello", "body")
+        self.assertEqual(self._drain(False)["retry"], 1)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), ('pending', 1))
+        self.assertGreater(row.next_attempt_at, timezone.now())
+        # not due yet
+        self.assertEqual(self._drain(True)["sent"], 0)
+
+    def test_last_attempt_fails_and_releases_token(self):
+        from .models import SentNotification
+        token = SentNotification.objects.create(user=self.user, media_id=1, media_type='series',
+                                                air_date=timezone.now().date(), media_title="t")
+        row = outbox.enqueue_notification(self.user, "Hello", "body", sent_notification_id=token.pk)
+        NotificationOutbox.objects.filter(pk=row.pk).update(attempts=outbox.MAX_ATTEMPTS - 1)
+        self.assertEqual(self._drain(False)["failed"], 1)
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'failed')
+        self.assertFalse(SentNotification.objects.filter(pk=token.pk).exists())
+
+    def test_rows_of_a_dead_worker_are_claimed_again(self):
+        row = outbox.enqueue_notification(self.user, "Hello", "body")
+        NotificationOutbox.objects.filter(pk=row.pk).update(
+            status='sending', claimed_by='dead', claimed_at=timezone.now() - timedelta(seconds=outbox.CLAIM_TIMEOUT + 1),
+        )
+        self.assertEqual(self._drain(True)["sent"], 1)
+
+    def test_finished_rows_are_purged_after_retention(self):
+        old = outbox.enqueue_notification(self.user, "Old", "body")
+        pending = outbox.enqueue_notification(self.user, "Pending", "body")
+        recent = outbox.enqueue_notification(self.user, "Recent", "body")
+        NotificationOutbox.objects.filter(pk__in=[old.pk, recent.pk]).update(status='sent')
+        NotificationOutbox.objects.filter(pk__in=[old.pk, pending.pk]).update(
+            created_at=timezone.now() - timedelta(days=outbox.RETENTION_DAYS + 1),
+        )
+        self.assertEqual(outbox.purge_finished(), 1)
+        self.assertEqual(set(NotificationOutbox.objects.values_list('pk', flat=True)), {pending.pk, recent.pk})
+
+    def test_failed_youtube_event_releases_its_video_token(self):
+        from youtube.models import YTSentNotification
+        YTSentNotification.objects.create(user=self.user, video_id="vid1", published_date=timezone.now().date(), title="t")
+        outbox.enqueue_notification(self.user, "New video", "body", context={'video_id': "vid1"})
+        with mock.patch.object(outbox, "MAX_ATTEMPTS", 1):
+            self.assertEqual(self._drain(False)["failed"], 1)
+        self.assertFalse(YTSentNotification.objects.filter(user=self.user, video_id="vid1").exists())
+
+
+class EmailBatchTests(TestCase):
+    cfg = {'host': 'smtp', 'port': 25, 'use_tls': False, 'use_ssl': False, 'username': '', 'password': '',
+           'from_email': 'from@example.com'}
+
+    def setUp(self):
+        self.user = User.objects.create(username="mail", email="m@example.com")
+
+    def _connections(self, *results):
+        conns = []
+        for result in results:
+            conn = mock.Mock()
+            conn.send_messages.side_effect = [result]
+            conns.append(conn)
+        return conns
+
+    def test_reuses_one_connection(self):
+        conn = mock.Mock()
+        conn.send_messages.return_value = 1
+        with mock.patch.object(notifications, "get_email_connection", return_value=conn) as get:
+            with notifications.EmailBatch(self.cfg) as batch:
+                self.assertTrue(batch.send(self.user, "a", "b"))
+                self.assertTrue(batch.send(self.user, "c", "d"))
+        self.assertEqual(get.call_count, 1)
+        conn.close.assert_called_once()
+
+    def test_reconnects_once_when_server_dropped_the_connection(self):
+        conns = self._connections(smtplib.SMTPServerDisconnected("idle"), 1)
+        with mock.patch.object(notifications, "get_email_connection", side_effect=conns):
+            self.assertTrue(notifications.EmailBatch(self.cfg).send(self.user, "a", "b"))
+        conns[0].close.assert_called_once()
+
+    def test_other_errors_are_not_retried(self):
+        conns = self._connections(smtplib.SMTPRecipientsRefused({}), 1)
+        with mock.patch.object(notifications, "get_email_connection", side_effect=conns) as get:
+            with self.assertRaises(smtplib.SMTPRecipientsRefused):
+                notifications.EmailBatch(self.cfg).send(self.user, "a", "b")
+        self.assertEqual(get.call_count, 1)
+
+
+class RenderEventTests(SimpleTestCase):
+    template = "arr_api/email/new_media_notification.html"
+    ctx = {"title": "Show", "type": "Serie", "episode_title": "Pilot", "season": 1, "episode": 1,
+           "year": None, "overview": "Tom & Jerry <3", "poster_url": "", "air_date": None, "release_type": None}
+
+    def setUp(self):
+        notifications._render_cache.clear()
+        notifications.html_to_text.cache_clear()
+
+    def test_event_is_rendered_once_for_all_recipients(self):
+        with mock.patch.object(notifications, "render_to_string", wraps=notifications.render_to_string) as render:
+            anna_html, anna_text = notifications.render_event(self.template, dict(self.ctx), "anna")
+            evil_html, evil_text = notifications.render_event(self.template, dict(self.ctx), "<b>o'brien&co</b>")
+        render.assert_called_once()
+        self.assertEqual(notifications.html_to_text.cache_info().misses, 1)
+        self.assertIn("Hallo anna,", anna_html)
+        self.assertIn("Hallo anna,", anna_text)
+        self.assertIn("Hallo &lt;b&gt;o&#x27;brien&amp;co&lt;/b&gt;,", evil_html)
+        self.assertNotIn("<b>o'brien", evil_html)
+        self.assertIn("Hallo <b>o'brien&co</b>,", evil_text)
+        self.assertNotIn("anna", evil_html + evil_text)
+        self.assertNotIn(notifications._USERNAME_SLOT, evil_html + evil_text)
+
+    def test_matches_a_direct_render(self):
+        from django.template.loader import render_to_string
+        name = "<b>o'brien&co</b>"
+        notifications.render_event(self.template, dict(self.ctx), "anna")
+        html, text = notifications.render_event(self.template, dict(self.ctx), name)
+        direct = render_to_string(self.template, {**self.ctx, "username": name})
+        self.assertEqual(html, direct)
+        self.assertEqual(text, notifications.html_to_text(direct))
+
+
+class EpisodeIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ArrInstance.invalidate_cache()
+        self.inst = ArrInstance.objects.create(kind="sonarr", name="S", base_url="http://s", api_key="k")
+        self.episodes = [
+            {"seasonNumber": 1, "episodeNumber": 1, "hasFile": True},
+            {"seasonNumber": 1, "episodeNumber": 2, "hasFile": False},
+            # duplicate entries count as downloaded if any copy has a file
+            {"seasonNumber": 1, "episodeNumber": 2, "hasFile": True},
+            {"seasonNumber": 1, "episodeNumber": 3, "hasFile": False},
+        ]
+
+    def test_index_is_fetched_once_per_series(self):
+        run = {}
+        with mock.patch.object(notifications, "_sonarr_get", return_value=self.episodes) as get:
+            index = notifications.sonarr_episode_index(self.inst, 7, run_cache=run)
+            notifications.sonarr_episode_index(self.inst, 7, run_cache=run)
+            # a later run within EPISODE_INDEX_TTL is served from the shared cache
+            notifications.sonarr_episode_index(self.inst, 7, run_cache={})
+        get.assert_called_once_with("http://s", "k", "/api/v3/episode", params={"seriesId": 7})
+        self.assertEqual(index, {(1, 1): True, (1, 2): True, (1, 3): False})
+
+    def test_failed_fetch_is_not_cached_across_runs(self):
+        with mock.patch.object(notifications, "_sonarr_get", return_value=None):
+            self.assertEqual(notifications.sonarr_episode_index(self.inst, 7, run_cache={}), {})
+        with mock.patch.object(notifications, "_sonarr_get", return_value=self.episodes):
+            self.assertTrue(notifications.sonarr_episode_index(self.inst, 7, run_cache={})[(1, 1)])
+
+    def test_notification_run_downloads_each_series_once(self):
+        from .models import SeriesSubscription
+        for i in range(3):
+            user = User.objects.create(username=f"fan{i}", email=f"fan{i}@example.com")
+            SeriesSubscription.objects.create(user=user, series_id=7, series_title="Show")
+        now = timezone.now().isoformat()
+        today = [{"seriesId": 7, "episodeId": 100 + n, "seasonNumber": 1, "episodeNumber": n, "title": f"Ep {n}",
+                  "airDateUtc": now} for n in (1, 2, 3)]
+        with mock.patch.object(notifications, "get_todays_sonarr_calendar", return_value=today), \
+                mock.patch.object(notifications, "get_todays_radarr_calendar", return_value=[]), \
+                mock.patch.object(notifications, "delete_ended_series_subscriptions"), \
+                mock.patch.object(notifications, "delete_available_movie_subscriptions"), \
+                mock.patch.object(notifications, "_sonarr_get", return_value=self.episodes) as get:
+            notifications.check_and_notify_users()
+        get.assert_called_once()
+        # episodes 1 and 2 have files, for each of the three subscribers
+        self.assertEqual(NotificationOutbox.objects.count(), 6)
+
+
+class MovieSubscriptionMatchTests(TestCase):
+    def test_matches_by_id_and_by_unicode_title(self):
+        from .models import MovieSubscription
+        user = User.objects.create(username="movies", email="mv@example.com")
+        by_id = MovieSubscription.objects.create(user=user, movie_id=1, title="Other")
+        by_title = MovieSubscription.objects.create(user=user, movie_id=0, title="  ärger im Paradies ")
+        MovieSubscription.objects.create(user=user, movie_id=3, title="Unrelated")
+        # has its own movie id: not matched by title
+        MovieSubscription.objects.create(user=user, movie_id=4, title="Something")
+        movie_idx = {1: {"movieId": 1, "title": "Something"}, 2: {"movieId": 2, "title": "Ärger im Paradies"}}
+        found = {sub.pk for sub in notifications._movie_subscriptions_for(movie_idx)}
+        self.assertEqual(found, {by_id.pk, by_title.pk})
+
+
+class SentNotificationReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="tokens", email="t@example.com")
+        self.today = timezone.now().date()
+
+    def test_reserves_only_new_tokens(self):
+        from .models import SentNotification
+        SentNotification.objects.create(user=self.user, media_id=1, media_type='series', air_date=self.today, media_title="old")
+        reserved = notifications._reserve_sent_notifications([
+            (self.user.pk, 1, 'series', self.today, "old"),
+            (self.user.pk, 2, 'series', self.today, "new"),
+            (self.user.pk, 2, 'series', self.today, "new"),  # duplicate entries collapse
+        ])
+        self.assertEqual(set(reserved), {(self.user.pk, 2, 'series', self.today)})
+        self.assertEqual(SentNotification.objects.count(), 2)
+        # a second run finds everything reserved
+        self.assertEqual(notifications._reserve_sent_notifications([(self.user.pk, 2, 'series', self.today, "new")]), {})
+
+    def test_released_tokens_can_be_reserved_again(self):
+        entry = (self.user.pk, 3, 'movie', self.today, "film")
+        reserved = notifications._reserve_sent_notifications([entry])
+        notifications._release_sent_notifications(reserved.values())
+        self.assertEqual(len(notifications._reserve_sent_notifications([entry])), 1)
+
+
+class RadarrLibrarySnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        services._library_memo.clear()
+        self.inst = ArrInstance.objects.create(kind="radarr", name="R", base_url="http://r", api_key="k")
+
+    def _movie(self, has_file):
+        return {"id": 1, "tmdbId": 501, "title": "Film", "hasFile": has_file, "isAvailable": False}
+
+    def test_failed_cold_fetch_is_not_memoised(self):
+        with mock.patch.object(services, "_radarr_get", return_value=None):
+            self.assertEqual(services.radarr_library_snapshot(self.inst), {})
+        self.assertEqual(services._library_memo, {})
+
+    def test_index_follows_the_cached_list(self):
+        with mock.patch.object(services, "_radarr_get", return_value=[self._movie(False)]) as get:
+            self.assertFalse(services.radarr_library_snapshot(self.inst)[501].has_file)
+            services.radarr_library_snapshot(self.inst)
+            self.assertEqual(get.call_count, 1)
+        with mock.patch.object(services, "_radarr_get", return_value=[self._movie(True)]):
+            services._radarr_movie_list_cached(self.inst, refresh=True)
+            self.assertTrue(services.radarr_library_snapshot(self.inst)[501].has_file)
+
+    def test_lookups_check_the_stamp_key_only(self):
+        with mock.patch.object(services, "_radarr_get", return_value=[self._movie(False)]):
+            snap = services.radarr_library_snapshot(self.inst)
+        with mock.patch.object(services, "_radarr_movie_list_entry", side_effect=AssertionError("list loaded")):
+            for _ in range(10):
+                self.assertIs(services.radarr_library_snapshot(self.inst), snap)
+
+    def test_missing_stamp_key_reloads_list_but_reuses_index(self):
+        with mock.patch.object(services, "_radarr_get", return_value=[self._movie(False)]):
+            snap = services.radarr_library_snapshot(self.inst)
+        cache.delete(services._movie_list_stamp_key(self.inst))
+        with mock.patch.object(services, "_radarr_get", side_effect=AssertionError("upstream call")):
+            self.assertIs(services.radarr_library_snapshot(self.inst), snap)
+
+    def test_failed_tmdb_lookup_is_cached_as_error_not_as_empty_result(self):
+        with mock.patch.object(services, "_radarr_get", return_value=None):
+            self.assertEqual(services._lookup_tmdb_cached(self.inst, 501), [])
+        _value, soft, error = cache.get(f"arr:radarr:v2:{self.inst.id}:lookup:tmdb:501")
+        self.assertTrue(error)
+        self.assertLessEqual(soft - time.time(), caching.ERROR_TTL)
+
+    def test_missing_4k_list_loads_the_movie_list_once(self):
+        ArrInstance.invalidate_cache()
+        with mock.patch.object(services, "_radarr_get", return_value=[self._movie(False)]):
+            services._radarr_movie_list_cached(self.inst)
+        with mock.patch.object(services, "_radarr_movie_list_entry", wraps=services._radarr_movie_list_entry) as entry:
+            rows = services.list_movies_missing_4k_across_instances()
+        entry.assert_called_once()
+        self.assertEqual([m["tmdbId"] for m in rows], [501])
+
+
+class FourKDetectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        services._library_memo.clear()
+        ArrInstance.invalidate_cache()
+        self.inst = ArrInstance.objects.create(kind="radarr", name="R", base_url="http://r", api_key="k")
+
+    @staticmethod
+    def _file(quality="Bluray-1080p", width=1920, **extra):
+        return {"quality": {"quality": {"name": quality}}, "mediaInfo": {"width": width}, **extra}
+
+    def _library(self, movies, files=()):
+        calls = []
+
+        def upstream(base, key, path, params=None):
+            calls.append((path, params))
+            if path == "/api/v3/movie":
+                return movies
+            if path == "/api/v3/moviefile":
+                return [f for f in files if f["movieId"] in params["movieId"]]
+            raise AssertionError(f"unexpected call to {path}")
+
+        with mock.patch.object(services, "_radarr_get", side_effect=upstream):
+            return services.radarr_library_snapshot(self.inst), calls
+
+    def test_embedded_movie_files_need_no_extra_calls(self):
+        movies = [
+            {"id": 1, "tmdbId": 11, "hasFile": True, "movieFile": self._file("Remux-2160p", 3840)},
+            {"id": 2, "tmdbId": 12, "hasFile": True, "movieFile": self._file("WEBDL-1080p", 3840)},
+            {"id": 3, "tmdbId": 13, "hasFile": True, "movieFile": self._file("Bluray-2160p", 0)},
+            {"id": 4, "tmdbId": 14, "hasFile": True, "movieFile": self._file()},
+            {"id": 5, "tmdbId": 15, "hasFile": False},
+        ]
+        library, calls = self._library(movies)
+        self.assertEqual([path for path, _params in calls], ["/api/v3/movie"])
+        self.assertEqual({tmdb for tmdb, e in library.items() if e.has4k}, {11, 12, 13})
+        self.assertFalse(library[15].has_file)
+
+    def test_files_not_embedded_are_fetched_in_bulk(self):
+        movies = [{"id": n, "tmdbId": 1000 + n, "hasFile": True} for n in range(1, 251)]
+        files = [self._file("UHD" if n % 50 == 0 else "Bluray-1080p", movieId=n) for n in range(1, 251)]
+        library, calls = self._library(movies, files)
+        bulk = [params["movieId"] for path, params in calls if path == "/api/v3/moviefile"]
+        self.assertEqual([len(ids) for ids in bulk], [100, 100, 50])
+        self.assertEqual(sorted(sum(bulk, [])), list(range(1, 251)))
+        self.assertEqual({tmdb for tmdb, e in library.items() if e.has4k}, {1050, 1100, 1150, 1200, 1250})
+
+    def test_4k_in_any_instance_counts(self):
+        ArrInstance.objects.create(kind="radarr", name="R2", base_url="http://r2", api_key="k")
+        lists = {
+            "http://r": [{"id": 1, "tmdbId": 11, "title": "Both", "hasFile": True, "movieFile": self._file()},
+                         {"id": 2, "tmdbId": 12, "title": "HD only", "hasFile": True, "movieFile": self._file()}],
+            "http://r2": [{"id": 9, "tmdbId": 11, "title": "Both", "hasFile": True,
+                           "movieFile": self._file("Remux-2160p", 3840)}],
+        }
+        with mock.patch.object(services, "_radarr_get", side_effect=lambda base, key, path, params=None: lists[base]):
+            self.assertTrue(services.tmdb_has_4k_any_instance(11))
+            self.assertFalse(services.tmdb_has_4k_any_instance(12))
+            self.assertEqual([m["tmdbId"] for m in services.list_movies_missing_4k_across_instances()], [12])
+
+
+class StaleSubscriptionCleanupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        services._library_memo.clear()
+        ArrInstance.invalidate_cache()
+        ArrInstance.objects.create(kind="sonarr", name="S", base_url="http://s", api_key="k")
+        ArrInstance.objects.create(kind="radarr", name="R", base_url="http://r", api_key="k")
+        self.users = [User.objects.create(username=f"clean{i}", email=f"c{i}@example.com") for i in range(3)]
+
+    def test_subscriptions_to_ended_series_are_deleted_with_one_call(self):
+        from .models import SeriesSubscription
+        for u in self.users:
+            SeriesSubscription.objects.create(user=u, series_id=1, series_title="Running")
+            SeriesSubscription.objects.create(user=u, series_id=2, series_title="Ended")
+        series = [{"id": 1, "status": "continuing"}, {"id": 2, "status": "ended"}]
+        with mock.patch.object(notifications, "_sonarr_get", return_value=series) as get:
+            self.assertEqual(notifications.delete_ended_series_subscriptions(), 3)
+            notifications.delete_ended_series_subscriptions()
+        get.assert_called_once()
+        self.assertEqual(set(SeriesSubscription.objects.values_list("series_id", flat=True)), {1})
+
+    def test_subscriptions_to_downloaded_movies_are_deleted_with_one_call(self):
+        from .models import MovieSubscription
+        for u in self.users:
+            MovieSubscription.objects.create(user=u, movie_id=1, title="Downloaded")
+            MovieSubscription.objects.create(user=u, movie_id=2, title="Missing")
+        movies = [{"id": 1, "tmdbId": 11, "hasFile": True, "movieFile": {"quality": {"quality": {"name": "HD-1080p"}}}},
+                  {"id": 2, "tmdbId": 12, "hasFile": False}]
+        with mock.patch.object(services, "_radarr_get", return_value=movies) as get:
+            self.assertEqual(notifications.delete_available_movie_subscriptions(), 3)
+        get.assert_called_once()
+        self.assertEqual(set(MovieSubscription.objects.values_list("movie_id", flat=True)), {2})
+
+
+class WarmerTests(TestCase):
+    def setUp(self):
+        warmer._refreshed.clear()
+        ArrInstance.invalidate_cache()
+        ArrInstance.objects.create(kind="sonarr", name="S", base_url="http://s", api_key="k")
+        ArrInstance.objects.create(kind="radarr", name="R", base_url="http://r", api_key="k")
+
+    def test_each_entry_is_refreshed_just_before_its_own_ttl(self):
+        interval = 96
+        refreshed = {"calendar": [], "movie list": []}
+        with mock.patch.object(warmer, "_calendar_window_cached",
+                               side_effect=lambda inst, refresh: refreshed["calendar"].append((clock, inst.kind))), \
+                mock.patch.object(warmer, "_radarr_movie_list_cached",
+                                  side_effect=lambda inst, refresh: refreshed["movie list"].append(clock)), \
+                mock.patch.object(warmer, "CAL_TTL", 120), mock.patch.object(warmer, "RADARR_LIST_TTL", 300), \
+                mock.patch.object(warmer.time, "monotonic", side_effect=lambda: clock):
+            for cycle in range(11):
+                clock = cycle * interval
+                warmer.warm_once(interval)
+        # calendars expire within one interval: refreshed on every wake-up
+        self.assertEqual(len(refreshed["calendar"]), 22)
+        lists = refreshed["movie list"]
+        self.assertEqual(lists, [0, 288, 576, 864])
+        self.assertTrue(all(b - a < 300 for a, b in zip(lists, lists[1:])))
+
+    def test_failed_refresh_is_retried_on_the_next_wake_up(self):
+        with mock.patch.object(warmer, "_calendar_window_cached"), \
+                mock.patch.object(warmer, "_radarr_movie_list_cached", side_effect=RuntimeError("down")) as movies, \
+                self.assertLogs(warmer.logger, "WARNING"):
+            self.assertEqual(warmer.warm_once(10)["failed"], 1)
+            self.assertEqual(warmer.warm_once(10)["failed"], 1)
+        self.assertEqual(movies.call_count, 2)
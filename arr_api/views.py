@@ -1,4 +1,3 @@
-from collections import defaultdict
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.contrib import messages
@@ -11,7 +10,7 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from settingspanel.models import AppSettings, ArrInstance
-from .services import sonarr_calendar, radarr_calendar, ArrServiceError, list_movies_missing_4k_across_instances, tmdb_has_4k_any_instance, radarr_lookup_movie_by_tmdb_id, tmdb_is_available_any_instance, sonarr_calendar_cached, radarr_calendar_cached
+from .services import sonarr_calendar, radarr_calendar, ArrServiceError, list_movies_missing_4k_across_instances, tmdb_has_4k_any_instance, radarr_lookup_movie_by_tmdb_id, tmdb_is_available_any_instance, fetch_calendars_concurrently
 from .models import SeriesSubscription, MovieSubscription, Movie4KSubscription
 from django.utils import timezone
 
@@ -24,7 +23,7 @@ def _get_int(request, key, default):
         return default
 
 def _arr_instances():
-    inst = list(ArrInstance.objects.filter(enabled=True).order_by("order", "id"))
+    inst = ArrInstance.enabled_instances()
     if inst:
         return inst
     # Fallback to legacy single-instance fields for backward compatibility
@@ -66,22 +65,13 @@ class ArrIndexView(View):
         kind = (request.GET.get("kind") or "all").lower()
         days = _get_int(request, "days", 30)
 
-        eps, movies = [], []
-        for inst in _arr_instances():
-            if inst.kind == "sonarr":
-                try:
-                    eps.extend(sonarr_calendar_cached(inst, days))
-                except Exception as e:
-                    messages.error(request, f"Sonarr ({inst.name}) is not reachable: {e}")
-            elif inst.kind == "radarr":
-                try:
-                    movies.extend(radarr_calendar_cached(inst, days))
-                except Exception as e:
-                    messages.error(request, f"Radarr ({inst.name}) is not reachable: {e}")
+        eps, series, movies, errors = fetch_calendars_concurrently(_arr_instances(), days)
+        for inst, err in errors:
+            messages.error(request, f"{inst.get_kind_display()} ({inst.name}) is not reachable: {err}")
 
         # Suche
         if q:
-            eps = [e for e in eps if q in (e.get("seriesTitle") or "").lower()]
+            eps = [e for e in eps if q in ((series.get((e["instanceId"], e["seriesId"])) or {}).get("seriesTitle") or "").lower()]
             movies = [m for m in movies if q in (m.get("title") or "").lower()]
 
         # Abonnierte Serien und Filme pro aktuellem Nutzer
@@ -92,21 +82,23 @@ class ArrIndexView(View):
             subscribed_series_ids = set()
             subscribed_movie_ids = set()
 
-        # Gruppierung nach Serie
-        groups = defaultdict(lambda: {
-            "seriesId": None, "seriesTitle": None, "seriesPoster": None,
-            "seriesOverview": "", "seriesGenres": [], "episodes": [], "is_subscribed": False,
-        })
+        # Gruppierung nach Serie pro Instanz (Metadaten aus der Serien-Tabelle)
+        groups = {}
         for e in eps:
             sid = e["seriesId"]
-            g = groups[sid]
-            g["seriesId"] = sid
-            g["seriesTitle"] = e["seriesTitle"]
-            g["seriesPoster"] = g["seriesPoster"] or e.get("seriesPoster")
-            if not g["seriesOverview"] and e.get("seriesOverview"):
-                g["seriesOverview"] = e["seriesOverview"]
-            if not g["seriesGenres"] and e.get("seriesGenres"):
-                g["seriesGenres"] = e["seriesGenres"]
+            key = (e["instanceId"], sid)
+            g = groups.get(key)
+            if g is None:
+                info = series.get(key) or {}
+                g = groups[key] = {
+                    "seriesId": sid,
+                    "seriesTitle": info.get("seriesTitle"),
+                    "seriesPoster": info.get("seriesPoster"),
+                    "seriesOverview": info.get("seriesOverview") or "",
+                    "seriesGenres": info.get("seriesGenres") or [],
+                    "episodes": [],
+                    "is_subscribed": False,
+                }
             g["episodes"].append({
                 "episodeId": e["episodeId"],
                 "seasonNumber": e["seasonNumber"],
@@ -158,18 +150,7 @@ class CalendarView(View):
 class CalendarEventsApi(APIView):
     def get(self, request):
         days = _get_int(request, "days", 60)
-        eps, movies = [], []
-        for inst in _arr_instances():
-            if inst.kind == "sonarr":
-                try:
-                    eps.extend(sonarr_calendar_cached(inst, days))
-                except Exception:
-                    pass
-            elif inst.kind == "radarr":
-                try:
-                    movies.extend(radarr_calendar_cached(inst, days))
-                except Exception:
-                    pass
+        eps, series, movies, errors = fetch_calendars_concurrently(_arr_instances(), days)
 
         series_sub = set(SeriesSubscription.objects.filter(user=request.user).values_list('series_id', flat=True))
         movie_sub_titles = set(MovieSubscription.objects.filter(user=request.user).values_list('title', flat=True))
@@ -179,20 +160,21 @@ class CalendarEventsApi(APIView):
             when = e.get("airDateUtc")
             if not when:
                 continue
+            info = series.get((e.get('instanceId'), e.get('seriesId'))) or {}
             events.append({
                 "id": f"s:{e.get('seriesId')}:{e.get('episodeId')}",
-                "title": f"{e.get('seriesTitle','')} — S{e.get('seasonNumber')}E{e.get('episodeNumber')}",
+                "title": f"{info.get('seriesTitle') or ''} — S{e.get('seasonNumber')}E{e.get('episodeNumber')}",
                 "start": when,
                 "allDay": False,
                 "extendedProps": {
                     "kind": "series",
                     "seriesId": e.get('seriesId'),
-                    "seriesTitle": e.get('seriesTitle'),
+                    "seriesTitle": info.get('seriesTitle'),
                     "seasonNumber": e.get('seasonNumber'),
                     "episodeNumber": e.get('episodeNumber'),
                     "episodeTitle": e.get('title'),
-                    "overview": e.get('seriesOverview') or "",
-                    "poster": e.get('seriesPoster') or "",
+                    "overview": info.get('seriesOverview') or "",
+                    "poster": info.get('seriesPoster') or "",
                     "subscribed": int(e.get('seriesId') or 0) in series_sub,
                 }
             })
@@ -223,7 +205,10 @@ class CalendarEventsApi(APIView):
                 }
             })
 
-        return Response({"events": events})
+        return Response({
+            "events": events,
+            "errors": [{"instance": inst.name, "kind": inst.kind, "error": err} for inst, err in errors],
+        })
 
 
  
@@ -334,7 +319,7 @@ class SeriesSubscribeView(APIView):
         # Try enabled Sonarr instances first, fallback to legacy single instance
         details = None
         try:
-            inst = ArrInstance.objects.filter(enabled=True, kind='sonarr').order_by('order', 'id')
+            inst = ArrInstance.enabled_instances('sonarr')
             for s in inst:
                 try:
                     details = sonarr_get_series(series_id, base_url=s.base_url, api_key=s.api_key)
@@ -381,7 +366,7 @@ class MovieSubscribeView(APIView):
         # Try enabled Radarr instances first, fallback to legacy single instance
         details = None
         try:
-            inst = ArrInstance.objects.filter(enabled=True, kind='radarr').order_by('order', 'id')
+            inst = ArrInstance.enabled_instances('radarr')
             for r in inst:
                 try:
                     details = radarr_lookup_movie_by_title(title, base_url=r.base_url, api_key=r.api_key)
@@ -519,7 +504,7 @@ class Movie4KSubscribeView(APIView):
         if not title or not poster:
             try:
                 # Try across enabled instances
-                for inst in ArrInstance.objects.filter(enabled=True, kind='radarr').order_by('order','id'):
+                for inst in ArrInstance.enabled_instances('radarr'):
                     details = radarr_lookup_movie_by_tmdb_id(tmdb_id, base_url=inst.base_url, api_key=inst.api_key)
                     if details:
                         break
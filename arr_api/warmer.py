@@ -0,0 +1,88 @@
+# arr_api/warmer.py
+"""
+Background refresher for the Arr caches in services.py.
+
+Calendars and Radarr movie lists are re-fetched ahead of expiry so requests
+are served from cache instead of waiting on Sonarr/Radarr. Each entry is
+refreshed on the last wake-up before its own TTL runs out, so movie lists
+are not downloaded at the calendar rate. If a refresh fails the
+stale-while-revalidate cache keeps serving the previous value.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.db import close_old_connections
+
+from settingspanel.models import ArrInstance
+from .services import (
+    CAL_TTL, RADARR_LIST_TTL,
+    _calendar_window_cached, _radarr_movie_list_cached,
+)
+
+logger = logging.getLogger(__name__)
+
+WARMER_ENABLED = os.getenv("ARR_CACHE_WARMER", "true").lower() in ("1", "true", "yes")
+WARM_INTERVAL = int(os.getenv("ARR_WARM_INTERVAL", str(max(10, int(min(CAL_TTL, RADARR_LIST_TTL) * 0.8)))))
+
+_thread: threading.Thread | None = None
+_thread_lock = threading.Lock()
+
+# (what, instance id) -> time.monotonic() of the last successful refresh by this warmer
+_refreshed: dict = {}
+
+
+def _warm(what, inst, ttl, interval, now, refresh, stats):
+    last = _refreshed.get((what, inst.id))
+    if last is not None and now - last < ttl - interval:
+        # still fresh at the next wake-up
+        return
+    try:
+        refresh(inst, refresh=True)
+        _refreshed[(what, inst.id)] = now
+        stats["refreshed"] += 1
+    except Exception as e:
+        stats["failed"] += 1
+        logger.warning("Cache warm failed for %s %s: %s", inst, what, e)
+
+
+def warm_once(interval: int | None = None) -> dict:
+    """
+    Refresh calendar windows and Radarr movie lists of all enabled instances
+    that would expire before the next wake-up, `interval` seconds from now.
+    """
+    interval = interval or WARM_INTERVAL
+    now = time.monotonic()
+    stats = {"refreshed": 0, "failed": 0}
+    for inst in ArrInstance.enabled_instances():
+        if inst.kind in ("sonarr", "radarr"):
+            _warm("calendar", inst, CAL_TTL, interval, now, _calendar_window_cached, stats)
+        if inst.kind == "radarr":
+            _warm("movie list", inst, RADARR_LIST_TTL, interval, now, _radarr_movie_list_cached, stats)
+    return stats
+
+
+def run_forever(interval: int | None = None, stop: threading.Event | None = None):
+    interval = interval or WARM_INTERVAL
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            warm_once(interval)
+        except Exception:
+            logger.exception("Arr cache warm cycle failed")
+        finally:
+            close_old_connections()
+        stop.wait(interval)
+
+
+def start_background_warmer():
+    """Start the in-process warmer thread once (no-op if disabled or already running)."""
+    global _thread
+    if not WARMER_ENABLED:
+        return None
+    with _thread_lock:
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=run_forever, name="arr-cache-warmer", daemon=True)
+            _thread.start()
+    return _thread
@@ -75,6 +75,8 @@ PATH=/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin
 # gleiche DB wie die App:
 DB_PATH=${DB_PATH:-/app/data/db.sqlite3}
 PYTHON=/usr/local/bin/python
+# delivery is done by run_notification_worker below
+NOTIFY_WORKER=true
 EOF
 
   # check_new_media on CRON_SCHEDULE, if provided
@@ -92,5 +94,8 @@ EOF
   /usr/sbin/cron
 fi
 
+# Deliver queued notifications in the background
+python manage.py run_notification_worker >> /app/worker.log 2>&1 &
+
 # Run server
 exec python manage.py runserver 0.0.0.0:8000
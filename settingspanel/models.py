@@ -1,5 +1,15 @@
+import copy
+import os
+import time
+
 from django.db import models
 
+# Seconds a cached AppSettings row is trusted before its updated_at is re-checked
+APPSETTINGS_RECHECK = float(os.getenv("APPSETTINGS_RECHECK_SECONDS", "30"))
+
+_current = {"obj": None, "checked": 0.0}
+_instances = {"rows": None, "version": None, "checked": 0.0}
+
 class AppSettings(models.Model):
     # Singleton pattern via fixed ID
     singleton_id = models.PositiveSmallIntegerField(default=1, unique=True, editable=False)
@@ -54,9 +64,28 @@ class AppSettings(models.Model):
 
     @classmethod
     def current(cls):
-        """Get the current settings instance or create a new one"""
+        """
+        Get the current settings instance or create a new one.
+        Cached per process: saves in this process invalidate it via signals,
+        saves elsewhere are noticed by an updated_at check every
+        APPSETTINGS_RECHECK seconds. Returns a copy, so callers may modify it.
+        """
+        now = time.monotonic()
+        obj = _current["obj"]
+        if obj is not None and now - _current["checked"] < APPSETTINGS_RECHECK:
+            return copy.copy(obj)
+        if obj is not None:
+            version = cls.objects.filter(pk=obj.pk).values_list("updated_at", flat=True).first()
+            if version == obj.updated_at:
+                _current["checked"] = now
+                return copy.copy(obj)
         obj, _ = cls.objects.get_or_create(singleton_id=1)
-        return obj
+        _current.update(obj=obj, checked=now)
+        return copy.copy(obj)
+
+    @classmethod
+    def invalidate_cache(cls):
+        _current.update(obj=None, checked=0.0)
         
     def get_jellyfin_url(self):
         """Get the Jellyfin server URL with proper formatting"""
@@ -89,3 +118,34 @@ class ArrInstance(models.Model):
 
     def __str__(self):
         return f"{self.get_kind_display()} – {self.name}"
+
+    @classmethod
+    def enabled_instances(cls, kind: str | None = None):
+        """
+        Enabled instances in display order, optionally only one kind.
+        Cached per process like AppSettings.current(): saves/deletes here
+        invalidate it via signals, changes made by other processes are
+        noticed by a count/updated_at check every APPSETTINGS_RECHECK seconds.
+        Returns copies, so callers may modify them.
+        """
+        now = time.monotonic()
+        rows = _instances["rows"]
+        if rows is not None and now - _instances["checked"] >= APPSETTINGS_RECHECK:
+            if cls._version() == _instances["version"]:
+                _instances["checked"] = now
+            else:
+                rows = None
+        if rows is None:
+            version = cls._version()
+            rows = list(cls.objects.filter(enabled=True).order_by("order", "id"))
+            _instances.update(rows=rows, version=version, checked=now)
+        return [copy.copy(i) for i in rows if kind is None or i.kind == kind]
+
+    @classmethod
+    def _version(cls):
+        agg = cls.objects.aggregate(n=models.Count("id"), changed=models.Max("updated_at"))
+        return agg["n"], agg["changed"]
+
+    @classmethod
+    def invalidate_cache(cls):
+        _instances.update(rows=None, version=None, checked=0.0)
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import AppSettings, ArrInstance
+
+
+@receiver(post_save, sender=AppSettings)
+@receiver(post_delete, sender=AppSettings)
+def invalidate_app_settings(sender, **kwargs):
+    AppSettings.invalidate_cache()
+
+
+@receiver(post_save, sender=ArrInstance)
+@receiver(post_delete, sender=ArrInstance)
+def invalidate_arr_instances(sender, **kwargs):
+    ArrInstance.invalidate_cache()
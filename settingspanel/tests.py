@@ -1,3 +1,68 @@
+from django.db.models.functions import Now
 from django.test import TestCase
 
-# Create your tests here.
+from . import models
+from .models import AppSettings, ArrInstance
+
+
+class AppSettingsCacheTests(TestCase):
+    def setUp(self):
+        AppSettings.invalidate_cache()
+
+    def test_current_is_served_from_cache(self):
+        AppSettings.current()
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                AppSettings.current()
+
+    def test_returns_copies(self):
+        cfg = AppSettings.current()
+        cfg.mail_host = "changed.example.com"
+        self.assertNotEqual(AppSettings.current().mail_host, "changed.example.com")
+
+    def test_save_invalidates_cache(self):
+        cfg = AppSettings.current()
+        cfg.mail_host = "smtp.example.com"
+        cfg.save()
+        self.assertEqual(AppSettings.current().mail_host, "smtp.example.com")
+
+    def test_changes_from_other_processes_are_picked_up_on_recheck(self):
+        AppSettings.current()
+        # a queryset update skips signals, like a save in another process
+        AppSettings.objects.update(mail_host="other.example.com", updated_at=Now())
+        self.assertNotEqual(AppSettings.current().mail_host, "other.example.com")
+        models._current["checked"] = 0.0
+        self.assertEqual(AppSettings.current().mail_host, "other.example.com")
+
+
+class ArrInstanceRegistryTests(TestCase):
+    def setUp(self):
+        ArrInstance.invalidate_cache()
+        self.sonarr = ArrInstance.objects.create(kind="sonarr", name="S", base_url="http://s", api_key="k", order=1)
+        self.radarr = ArrInstance.objects.create(kind="radarr", name="R", base_url="http://r", api_key="k", order=0)
+        ArrInstance.objects.create(kind="radarr", name="Off", base_url="http://o", api_key="k", enabled=False)
+
+    def test_enabled_instances_by_kind_and_order(self):
+        self.assertEqual([i.pk for i in ArrInstance.enabled_instances()], [self.radarr.pk, self.sonarr.pk])
+        self.assertEqual([i.pk for i in ArrInstance.enabled_instances("sonarr")], [self.sonarr.pk])
+
+    def test_served_from_cache(self):
+        ArrInstance.enabled_instances()
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                ArrInstance.enabled_instances("radarr")
+
+    def test_save_and_delete_invalidate_cache(self):
+        ArrInstance.enabled_instances()
+        self.sonarr.enabled = False
+        self.sonarr.save()
+        self.assertEqual(ArrInstance.enabled_instances("sonarr"), [])
+        self.radarr.delete()
+        self.assertEqual(ArrInstance.enabled_instances(), [])
+
+    def test_changes_from_other_processes_are_picked_up_on_recheck(self):
+        ArrInstance.enabled_instances()
+        ArrInstance.objects.filter(pk=self.sonarr.pk).update(enabled=False, updated_at=Now())
+        self.assertEqual(len(ArrInstance.enabled_instances()), 2)
+        models._instances["checked"] = 0.0
+        self.assertEqual([i.pk for i in ArrInstance.enabled_instances()], [self.radarr.pk])
@@ -17,8 +17,6 @@ from arr_api.models import SeriesSubscription, MovieSubscription, Movie4KSubscri
 from youtube.models import YouTubeSubscription
 from django.db.models import Count
 import requests
-from django.core.mail import send_mail
-from django.conf import settings as dj_settings
 from django.utils import timezone
 
 def needs_setup():
@@ -226,7 +224,7 @@ def test_notify(request):
     user = request.user
     title = "Subscribarr test notification"
     body = "This is a test notification from Subscribarr settings."
-    from arr_api.notifications import _dispatch_user_notification, _set_runtime_email_settings
+    from arr_api.notifications import _dispatch_user_notification, EmailBatch
 
     # Force user's channel for this test if requested; otherwise dispatch to chosen channel explicitly
     if channel in ("ntfy", "apprise"):
@@ -241,11 +239,10 @@ def test_notify(request):
     else:
         # email
         try:
-            _set_runtime_email_settings()
-            to = [user.email] if getattr(user, 'email', None) else []
-            if not to:
+            if not getattr(user, 'email', None):
                 return JsonResponse({"ok": False, "error": "User has no email address set"}, status=400)
-            send_mail(title, body, dj_settings.DEFAULT_FROM_EMAIL, to, fail_silently=False)
+            with EmailBatch() as mailer:
+                mailer.send(user, title, body)
             return JsonResponse({"ok": True})
         except Exception as e:
             return JsonResponse({"ok": False, "error": str(e)}, status=500)
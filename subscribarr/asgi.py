@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'subscribarr.settings')
 
 application = get_asgi_application()
+
+# Keep Sonarr/Radarr caches warm in the serving process (ARR_CACHE_WARMER=false disables)
+from arr_api.warmer import start_background_warmer  # noqa: E402
+
+start_background_warmer()
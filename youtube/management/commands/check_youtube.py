@@ -1,10 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.db import transaction
-from youtube.models import YouTubeSubscription, YTSentNotification
-from youtube.services import build_feed_url, fetch_feed_entries
-from django.template.loader import render_to_string
-from arr_api.notifications import _dispatch_user_notification
+from youtube.models import YouTubeFeedState, YouTubeSubscription, YTSentNotification
+from youtube.services import FEED_WORKERS, HostRateLimiter, build_feed_url, fetch_feed, resolve_handles
+from arr_api.notifications import render_event
+from arr_api.outbox import NOTIFY_WORKER, _is_digest_user, drain_all, enqueue_notifications
 
 
 class Command(BaseCommand):
@@ -12,6 +14,7 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--since', type=str, help='Only consider videos published since this ISO datetime (optional).')
+        parser.add_argument('--workers', type=int, default=FEED_WORKERS, help='Feeds downloaded concurrently.')
 
     def handle(self, *args, **options):
         since_dt = None
@@ -22,70 +25,152 @@ class Command(BaseCommand):
                 self.stderr.write('Invalid --since value, ignoring.')
 
         count_checked = 0
-        count_notified = 0
+        queued = []
         now = timezone.now()
-        for sub in YouTubeSubscription.objects.select_related('user').all():
-            feed_url = build_feed_url(sub.kind, sub.target_id)
+        limiter = HostRateLimiter()
+
+        # one download per feed, however many users follow it
+        feeds = {}
+        for sub in YouTubeSubscription.objects.select_related('user').order_by('kind', 'target_id'):
+            feeds.setdefault((sub.kind, sub.target_id.strip()), []).append(sub)
+        # @handle -> channel ID from the stored mappings; only new or expired handles hit YouTube
+        channel_ids = resolve_handles((t for _kind, t in feeds), limiter=limiter, workers=options['workers'])
+        # ETag/Last-Modified and newest video per feed URL, read up front for the worker threads
+        states = {st.feed_url: st for st in YouTubeFeedState.objects.all()}
+        results = {}
+
+        def fetch(kind, target_id):
+            # runs in a worker thread: network only, no DB access
+            feed_url = build_feed_url(kind, target_id, limiter=limiter, channel_ids=channel_ids)
             if not feed_url:
-                continue
-            entries = fetch_feed_entries(feed_url)
-            count_checked += 1
-            for ent in entries:
-                published = ent.get('published') or now
-                # Gate: publish date must be on/after subscription date
-                if sub.created_at and published.date() < sub.created_at.date():
-                    continue
-                # Optional global gate
-                if since_dt and published < since_dt:
-                    continue
-                vid = ent['video_id']
-                # Deduplicate per user+video
+                return None, None
+            st = states.get(feed_url)
+            if st is None or st.checked_at is None or any(
+                    s.created_at and s.created_at > st.checked_at for s in feeds[(kind, target_id)]):
+                # new feed, or someone subscribed since the last check: read it in full
+                return feed_url, fetch_feed(feed_url, limiter=limiter)
+            return feed_url, fetch_feed(feed_url, limiter=limiter, etag=st.etag, last_modified=st.last_modified,
+                                        newest_video_id=st.newest_video_id)
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers']), thread_name_prefix='yt-feed') as pool:
+            futures = {pool.submit(fetch, kind, target_id): (kind, target_id) for kind, target_id in feeds}
+            # dedupe tokens and messages are written from this thread as feeds come in
+            for fut in as_completed(futures):
+                subs = feeds[futures[fut]]
                 try:
-                    with transaction.atomic():
-                        token, created = YTSentNotification.objects.get_or_create(
-                            user=sub.user,
-                            video_id=vid,
-                            defaults={
-                                'published_date': published.date(),
-                                'title': ent.get('title') or '',
-                                'channel_title': ent.get('channel_title') or '',
-                            }
-                        )
-                    if not created:
-                        continue
+                    feed_url, result = fut.result()
                 except Exception:
+                    feed_url, result = None, None
+                if result is None:
+                    continue
+                count_checked += 1
+                results[feed_url] = result
+                if not result['changed']:
                     continue
-                title = ent.get('title') or 'New video'
-                channel = ent.get('channel_title') or ''
-                url = ent.get('url') or f'https://www.youtube.com/watch?v={vid}'
-                subj = f"New YouTube video: {title}"
-                # Render using the same rich template (use 'Film' type semantics)
-                html = None
+                for sub in subs:
+                    queued.extend(self._notifications(sub, feed_url, result['entries'], now, since_dt))
+        try:
+            enqueue_notifications(queued)
+        except Exception as e:
+            # rollback tokens so we can retry later
+            self.stderr.write(f'Could not queue notifications: {e}')
+            for q in queued:
+                YTSentNotification.objects.filter(user=q['user'], video_id=q['video_id']).delete()
+            queued = []
+        else:
+            # only remember what was seen once its notifications are safely queued
+            self._save_feed_states(states, results, now)
+        unchanged = sum(1 for r in results.values() if not r['changed'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {count_checked} feeds ({unchanged} unchanged) for {sum(map(len, feeds.values()))} subscriptions, '
+            f'queued {len(queued)} notifications.'
+        ))
+        if not NOTIFY_WORKER:
+            # no separate run_notification_worker: deliver what this check queued
+            stats = drain_all()
+            self.stdout.write(f"  outbox: sent={stats['sent']} retry={stats['retry']} failed={stats['failed']}")
+
+    def _notifications(self, sub, feed_url, entries, now, since_dt) -> list[dict]:
+        """Reserve dedupe tokens for new entries of one feed and build their outbox messages."""
+        out = []
+        for ent in entries:
+            published = ent.get('published') or now
+            # Gate: publish date must be on/after subscription date
+            if sub.created_at and published.date() < sub.created_at.date():
+                continue
+            # Optional global gate
+            if since_dt and published < since_dt:
+                continue
+            vid = ent['video_id']
+            # Deduplicate per user+video
+            try:
+                with transaction.atomic():
+                    token, created = YTSentNotification.objects.get_or_create(
+                        user=sub.user,
+                        video_id=vid,
+                        defaults={
+                            'published_date': published.date(),
+                            'title': ent.get('title') or '',
+                            'channel_title': ent.get('channel_title') or '',
+                        }
+                    )
+                if not created:
+                    continue
+            except Exception:
+                continue
+            title = ent.get('title') or 'New video'
+            channel = ent.get('channel_title') or ''
+            url = ent.get('url') or f'https://www.youtube.com/watch?v={vid}'
+            subj = f"New YouTube video: {title}"
+            ctx = {
+                'title': title,
+                'type': 'YouTube',
+                'overview': channel,
+                'poster_url': ent.get('thumb') or '',
+                'air_date': published.isoformat(),
+                'release_type': 'Video',
+                'url': url,
+                # lets the outbox release the YTSentNotification token and reset the
+                # feed's state if delivery finally fails, so the next check retries it
+                'video_id': vid,
+                'feed_url': feed_url,
+            }
+            # Render using the same rich template (use 'Film' type semantics); digest users get one summary later
+            html = None
+            if not _is_digest_user(sub.user):
                 try:
-                    ctx = {
-                        'username': sub.user.username,
-                        'title': title,
-                        'type': 'YouTube',
-                        'overview': channel,
-                        'poster_url': ent.get('thumb') or '',
-                        'episode_title': None,
-                        'season': None,
-                        'episode': None,
-                        'air_date': ent.get('published'),
-                        'year': None,
-                        'release_type': 'Video',
-                    }
-                    html = render_to_string('arr_api/email/new_media_notification.html', ctx)
+                    html, _text = render_event('arr_api/email/new_media_notification.html', {
+                        'episode_title': None, 'season': None, 'episode': None, 'year': None,
+                        **ctx, 'air_date': ent.get('published'),
+                    }, sub.user.username)
                 except Exception:
                     html = None
-                body = f"{title}\n{channel}\n{url}"
-                ok = _dispatch_user_notification(sub.user, subject=subj, body_text=body, html_message=html, click_url=url)
-                if ok:
-                    count_notified += 1
-                else:
-                    # rollback token so we can retry later
-                    try:
-                        YTSentNotification.objects.filter(user=sub.user, video_id=vid).delete()
-                    except Exception:
-                        pass
-        self.stdout.write(self.style.SUCCESS(f'Checked {count_checked} subscription feeds, sent {count_notified} notifications.'))
+            body = f"{title}\n{channel}\n{url}"
+            out.append({'user': sub.user, 'subject': subj, 'body_text': body, 'html_message': html,
+                        'click_url': url, 'context': ctx, 'video_id': vid})
+        return out
+
+    def _save_feed_states(self, states, results, now):
+        new, changed = [], []
+        for feed_url, result in results.items():
+            st = states.get(feed_url)
+            if st is None:
+                st = YouTubeFeedState(feed_url=feed_url)
+                new.append(st)
+            else:
+                changed.append(st)
+            st.etag = result['etag'][:255]
+            st.last_modified = result['last_modified'][:64]
+            if result['changed']:
+                st.newest_video_id = result['newest_video_id'][:64]
+                st.newest_published = result['newest_published']
+            st.checked_at = now
+            st.updated_at = now
+        try:
+            YouTubeFeedState.objects.bulk_create(new, batch_size=500, ignore_conflicts=True)
+            YouTubeFeedState.objects.bulk_update(
+                changed, ['etag', 'last_modified', 'newest_video_id', 'newest_published', 'checked_at', 'updated_at'],
+                batch_size=500,
+            )
+        except Exception as e:
+            self.stderr.write(f'Could not save feed states: {e}')
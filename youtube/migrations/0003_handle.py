@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('youtube', '0002_feed_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YouTubeHandle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('handle', models.CharField(max_length=128, unique=True)),
+                ('channel_id', models.CharField(max_length=64)),
+                ('resolved_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -19,6 +19,28 @@ class YouTubeSubscription(models.Model):
     def __str__(self):
         return f"{self.get_kind_display()}: {self.title}"
 
+class YouTubeHandle(models.Model):
+    """Resolved @handle -> channel ID, reused until it is older than YT_HANDLE_TTL_DAYS."""
+    handle = models.CharField(max_length=128, unique=True)  # lowercase, with leading @
+    channel_id = models.CharField(max_length=64)
+    resolved_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.handle} -> {self.channel_id}"
+
+class YouTubeFeedState(models.Model):
+    """Validators and newest entry of one feed URL, for conditional polling in check_youtube."""
+    feed_url = models.URLField(max_length=300, unique=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    newest_video_id = models.CharField(max_length=64, blank=True)
+    newest_published = models.DateTimeField(null=True, blank=True)
+    checked_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.feed_url
+
 class YTSentNotification(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     video_id = models.CharField(max_length=64)
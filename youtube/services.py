@@ -1,23 +1,58 @@
+import os
 import re
+import threading
+import time
 import requests
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime, timezone
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from functools import lru_cache
 
+from django.utils import timezone as dj_timezone
+
+from .models import YouTubeHandle
+
 
 ATOM_NS = '{http://www.w3.org/2005/Atom}'
 YT_NS = '{http://www.youtube.com/xml/schemas/2015}'
 MEDIA_NS = '{http://search.yahoo.com/mrss/}'
 
+FEED_WORKERS = int(os.getenv("YT_FEED_WORKERS", "8"))  # concurrent feed downloads in check_youtube
+FEED_RATE_PER_HOST = float(os.getenv("YT_FEED_RATE_PER_HOST", "10"))  # requests/second per host, 0 = unlimited
+HANDLE_TTL_DAYS = int(os.getenv("YT_HANDLE_TTL_DAYS", "30"))  # re-resolve stored @handle mappings after this
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least 1/per_second apart; shared by all worker threads."""
 
-def _resolve_handle_to_channel_id(handle: str, timeout: int = 6) -> str | None:
+    def __init__(self, per_second: float = FEED_RATE_PER_HOST):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, 0.0))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _resolve_handle_to_channel_id(handle: str, timeout: int = 6, limiter: HostRateLimiter | None = None) -> str | None:
     h = handle.strip()
     if h.startswith('/'):
         h = h[1:]
     if not h.startswith('@'):
         return None
     url = f"https://www.youtube.com/{h}"
+    if limiter is not None:
+        limiter.wait(url)
     try:
         r = requests.get(url, timeout=timeout)
         r.raise_for_status()
@@ -29,12 +64,57 @@ def _resolve_handle_to_channel_id(handle: str, timeout: int = 6) -> str | None:
     return None
 
 
-def build_feed_url(kind: str, target_id: str) -> str | None:
+def _handle_key(target_id: str) -> str | None:
+    h = (target_id or '').strip().lstrip('/')
+    return h.lower() if h.startswith('@') else None
+
+
+def resolve_handles(handles, limiter: HostRateLimiter | None = None, workers: int = 1) -> dict:
+    """
+    Map @handles (lowercased) to channel IDs. Stored mappings younger than
+    HANDLE_TTL_DAYS are reused; the others are looked up from the channel page
+    in `workers` threads and stored. DB access stays in the calling thread.
+    """
+    keys = {k for k in map(_handle_key, handles) if k}
+    if not keys:
+        return {}
+    fresh_after = dj_timezone.now() - timedelta(days=HANDLE_TTL_DAYS)
+    rows = {r.handle: r for r in YouTubeHandle.objects.filter(handle__in=keys)}
+    out = {k: r.channel_id for k, r in rows.items() if r.resolved_at >= fresh_after}
+    missing = [k for k in keys if k not in out]
+    if not missing:
+        return out
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing)))) as pool:
+        found = dict(zip(missing, pool.map(lambda k: _resolve_handle_to_channel_id(k, limiter=limiter), missing)))
+    now = dj_timezone.now()
+    for k, cid in found.items():
+        if cid:
+            YouTubeHandle.objects.update_or_create(handle=k, defaults={'channel_id': cid, 'resolved_at': now})
+            out[k] = cid
+        elif k in rows:
+            # lookup failed: keep using the expired mapping
+            out[k] = rows[k].channel_id
+    return out
+
+
+def resolve_handle(handle: str, limiter: HostRateLimiter | None = None) -> str | None:
+    return resolve_handles([handle], limiter=limiter).get(_handle_key(handle))
+
+
+def build_feed_url(kind: str, target_id: str, limiter: HostRateLimiter | None = None,
+                   channel_ids: dict | None = None) -> str | None:
+    """
+    Atom feed URL of a channel or playlist. @handles are looked up in
+    channel_ids (from resolve_handles) if given, else via resolve_handle().
+    """
     tid = (target_id or '').strip()
     if not tid:
         return None
     if tid.startswith('/@') or tid.startswith('@'):
-        cid = _resolve_handle_to_channel_id(tid)
+        if channel_ids is not None:
+            cid = channel_ids.get(_handle_key(tid))
+        else:
+            cid = resolve_handle(tid, limiter=limiter)
         if not cid:
             return None
         tid = cid
@@ -60,18 +140,57 @@ def _parse_dt(s: str) -> datetime | None:
         return None
 
 
-def fetch_feed_entries(feed_url: str, timeout: int = 10) -> list[dict]:
+# Atom feeds list the newest video first; its id is read without parsing the document
+_FIRST_VIDEO_ID = re.compile(r'<yt:videoId>\s*([^<\s]+)\s*</yt:videoId>')
+
+
+def fetch_feed(feed_url: str, timeout: int = 10, limiter: HostRateLimiter | None = None,
+               etag: str = '', last_modified: str = '', newest_video_id: str = '') -> dict | None:
+    """
+    Conditionally download one feed. Returns None on errors, else a dict with
+    changed, entries, etag, last_modified, newest_video_id, newest_published.
+    On 304 or when the first entry is still newest_video_id, changed is False,
+    entries is empty and the XML is not parsed.
+    """
     if not feed_url:
-        return []
+        return None
+    headers = {'User-Agent': 'Subscribarr/YouTube'}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    if limiter is not None:
+        limiter.wait(feed_url)
     try:
-        r = requests.get(feed_url, timeout=timeout, headers={'User-Agent': 'Subscribarr/YouTube'})
+        r = requests.get(feed_url, timeout=timeout, headers=headers)
+        if r.status_code == 304:
+            return {'changed': False, 'entries': [], 'etag': etag, 'last_modified': last_modified,
+                    'newest_video_id': newest_video_id, 'newest_published': None}
         r.raise_for_status()
     except requests.RequestException:
-        return []
+        return None
+    result = {'etag': r.headers.get('ETag') or '', 'last_modified': r.headers.get('Last-Modified') or ''}
+    m = _FIRST_VIDEO_ID.search(r.text)
+    if newest_video_id and m and m.group(1) == newest_video_id:
+        return {**result, 'changed': False, 'entries': [], 'newest_video_id': newest_video_id, 'newest_published': None}
+    entries = _parse_feed(r.text)
+    if entries is None:
+        return None
+    newest = entries[0] if entries else {}
+    return {**result, 'changed': True, 'entries': entries,
+            'newest_video_id': newest.get('video_id') or '', 'newest_published': newest.get('published')}
+
+
+def fetch_feed_entries(feed_url: str, timeout: int = 10, limiter: HostRateLimiter | None = None) -> list[dict]:
+    result = fetch_feed(feed_url, timeout=timeout, limiter=limiter)
+    return result['entries'] if result else []
+
+
+def _parse_feed(text: str) -> list[dict] | None:
     try:
-        root = ET.fromstring(r.text)
+        root = ET.fromstring(text)
     except ET.ParseError:
-        return []
+        return None
     entries = []
     for e in root.findall(f'{ATOM_NS}entry'):
         title_el = e.find(f'{ATOM_NS}title')
@@ -287,7 +406,7 @@ def get_youtube_metadata(kind: str, target_id: str) -> dict:
     # Resolve handle to channel ID if needed
     original_tid = tid
     if kind == 'channel' and (tid.startswith('@') or tid.startswith('/@')):
-        cid = _resolve_handle_to_channel_id(tid)
+        cid = resolve_handle(tid)
         if cid:
             tid = cid
     
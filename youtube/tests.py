@@ -0,0 +1,196 @@
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from arr_api import outbox
+from arr_api.models import NotificationOutbox
+from youtube import services
+from youtube.management.commands.check_youtube import Command
+from youtube.models import YouTubeFeedState, YouTubeHandle, YouTubeSubscription
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:yt="http://www.youtube.com/xml/schemas/2015">
+ <entry>
+  <yt:videoId>{first}</yt:videoId>
+  <title>Newest</title>
+  <link rel="alternate" href="https://www.youtube.com/watch?v={first}"/>
+  <published>2026-10-01T12:00:00+00:00</published>
+ </entry>
+ <entry>
+  <yt:videoId>older</yt:videoId>
+  <title>Older</title>
+  <link rel="alternate" href="https://www.youtube.com/watch?v=older"/>
+  <published>2026-09-01T12:00:00+00:00</published>
+ </entry>
+</feed>
+"""
+
+URL = "https://www.youtube.com/feeds/videos.xml?channel_id=UCabc"
+
+
+def _response(status=200, text="", headers=None):
+    r = mock.Mock(status_code=status, text=text, headers=headers or {})
+    if status >= 400:
+        r.raise_for_status.side_effect = requests.HTTPError(status)
+    return r
+
+
+class FetchFeedTests(SimpleTestCase):
+    def test_full_fetch_returns_entries_and_validators(self):
+        resp = _response(text=FEED.format(first="new1"), headers={"ETag": '"v1"', "Last-Modified": "Wed, 01 Oct 2026"})
+        with mock.patch.object(services.requests, "get", return_value=resp) as get:
+            res = services.fetch_feed(URL)
+        self.assertNotIn("If-None-Match", get.call_args.kwargs["headers"])
+        self.assertTrue(res["changed"])
+        self.assertEqual([e["video_id"] for e in res["entries"]], ["new1", "older"])
+        self.assertEqual((res["etag"], res["last_modified"]), ('"v1"', "Wed, 01 Oct 2026"))
+        self.assertEqual(res["newest_video_id"], "new1")
+        self.assertIsNotNone(res["newest_published"])
+
+    def test_not_modified_keeps_stored_state(self):
+        with mock.patch.object(services.requests, "get", return_value=_response(304)) as get:
+            res = services.fetch_feed(URL, etag='"v1"', last_modified="Wed, 01 Oct 2026", newest_video_id="new1")
+        headers = get.call_args.kwargs["headers"]
+        self.assertEqual(headers["If-None-Match"], '"v1"')
+        self.assertEqual(headers["If-Modified-Since"], "Wed, 01 Oct 2026")
+        self.assertFalse(res["changed"])
+        self.assertEqual(res["entries"], [])
+        self.assertEqual((res["etag"], res["newest_video_id"]), ('"v1"', "new1"))
+
+    def test_same_newest_video_skips_parsing(self):
+        resp = _response(text=FEED.format(first="new1"), headers={"ETag": '"v2"'})
+        with mock.patch.object(services.requests, "get", return_value=resp), \
+                mock.patch.object(services, "_parse_feed") as parse:
+            res = services.fetch_feed(URL, etag='"v1"', newest_video_id="new1")
+        parse.assert_not_called()
+        self.assertFalse(res["changed"])
+        self.assertEqual(res["etag"], '"v2"')
+
+    def test_new_upload_is_parsed(self):
+        resp = _response(text=FEED.format(first="new2"))
+        with mock.patch.object(services.requests, "get", return_value=resp):
+            res = services.fetch_feed(URL, newest_video_id="new1")
+        self.assertTrue(res["changed"])
+        self.assertEqual(res["newest_video_id"], "new2")
+
+    def test_errors_return_none(self):
+        with mock.patch.object(services.requests, "get", return_value=_response(500)):
+            self.assertIsNone(services.fetch_feed(URL))
+        with mock.patch.object(services.requests, "get", side_effect=requests.ConnectionError):
+            self.assertIsNone(services.fetch_feed(URL))
+        with mock.patch.object(services.requests, "get", return_value=_response(text="<not xml")):
+            self.assertIsNone(services.fetch_feed(URL))
+
+
+class SaveFeedStatesTests(TestCase):
+    def test_creates_and_updates_rows(self):
+        now = timezone.now()
+        published = now - timedelta(hours=1)
+        old = YouTubeFeedState.objects.create(feed_url="old", etag='"a"', newest_video_id="v0", checked_at=now)
+        results = {
+            "old": {"changed": False, "entries": [], "etag": '"b"', "last_modified": "",
+                    "newest_video_id": "ignored", "newest_published": None},
+            "new": {"changed": True, "entries": [], "etag": '"n"', "last_modified": "Wed, 01 Oct 2026",
+                    "newest_video_id": "v9", "newest_published": published},
+        }
+        Command()._save_feed_states({"old": old}, results, now)
+        old.refresh_from_db()
+        self.assertEqual((old.etag, old.newest_video_id), ('"b"', "v0"))
+        new = YouTubeFeedState.objects.get(feed_url="new")
+        self.assertEqual((new.etag, new.last_modified, new.newest_video_id), ('"n"', "Wed, 01 Oct 2026", "v9"))
+        self.assertEqual(new.newest_published, published)
+
+
+class CheckYoutubeRetryTests(TestCase):
+    def setUp(self):
+        self.feed = FEED.replace("2026-10-01T12:00:00+00:00", timezone.now().isoformat()).format(first="new1")
+        self.user = User.objects.create(username="viewer", email="viewer@example.com")
+        YouTubeSubscription.objects.create(user=self.user, kind="channel", target_id="UCabc", title="Chan")
+
+    def _get(self, url, timeout=10, headers=None):
+        # the feed never changes: conditional requests are answered with 304
+        if (headers or {}).get("If-None-Match"):
+            return _response(304)
+        return _response(text=self.feed, headers={"ETag": '"v1"'})
+
+    def _check(self):
+        with mock.patch.object(services.requests, "get", side_effect=self._get) as get, \
+                mock.patch("youtube.management.commands.check_youtube.drain_all"):
+            Command(stdout=mock.Mock(), stderr=mock.Mock()).handle(workers=1)
+        return get
+
+    def _queued(self, user):
+        return sorted(r.context["video_id"] for r in NotificationOutbox.objects.filter(user=user))
+
+    def test_unchanged_feed_is_not_read_again(self):
+        self._check()
+        self._check()
+        self.assertEqual(self._queued(self.user), ["new1"])
+        self.assertEqual(YouTubeFeedState.objects.get(feed_url=URL).etag, '"v1"')
+
+    def test_finally_failed_video_is_queued_again(self):
+        self._check()
+        outbox._release_tokens(list(NotificationOutbox.objects.filter(user=self.user)))
+        state = YouTubeFeedState.objects.get(feed_url=URL)
+        self.assertEqual((state.etag, state.newest_video_id), ("", ""))
+        get = self._check()
+        self.assertNotIn("If-None-Match", get.call_args.kwargs["headers"])
+        self.assertEqual(self._queued(self.user), ["new1", "new1"])
+
+    def test_new_subscriber_gets_videos_of_a_polled_feed(self):
+        self._check()
+        other = User.objects.create(username="late", email="late@example.com")
+        YouTubeSubscription.objects.create(user=other, kind="channel", target_id="UCabc", title="Chan")
+        self._check()
+        self.assertEqual(self._queued(other), ["new1"])
+        self.assertEqual(self._queued(self.user), ["new1"])
+
+
+class HandleMappingTests(TestCase):
+    def _resolve(self, *handles, returns="UCnew"):
+        with mock.patch.object(services, "_resolve_handle_to_channel_id", return_value=returns) as lookup:
+            out = services.resolve_handles(handles)
+        return out, lookup
+
+    def test_lookup_is_stored_and_reused(self):
+        out, lookup = self._resolve("@Chan", "/@chan")
+        self.assertEqual(out, {"@chan": "UCnew"})
+        lookup.assert_called_once()
+        self.assertEqual(YouTubeHandle.objects.get(handle="@chan").channel_id, "UCnew")
+        out, lookup = self._resolve("@CHAN", returns="UCother")
+        self.assertEqual(out, {"@chan": "UCnew"})
+        lookup.assert_not_called()
+
+    def test_expired_mapping_is_resolved_again(self):
+        old = timezone.now() - timedelta(days=services.HANDLE_TTL_DAYS + 1)
+        YouTubeHandle.objects.create(handle="@chan", channel_id="UCold", resolved_at=old)
+        out, lookup = self._resolve("@chan")
+        lookup.assert_called_once()
+        self.assertEqual(out, {"@chan": "UCnew"})
+        row = YouTubeHandle.objects.get(handle="@chan")
+        self.assertEqual(row.channel_id, "UCnew")
+        self.assertGreater(row.resolved_at, old)
+
+    def test_failed_lookup_keeps_expired_mapping(self):
+        old = timezone.now() - timedelta(days=services.HANDLE_TTL_DAYS + 1)
+        YouTubeHandle.objects.create(handle="@chan", channel_id="UCold", resolved_at=old)
+        out, _ = self._resolve("@chan", "@unknown", returns=None)
+        self.assertEqual(out, {"@chan": "UCold"})
+        self.assertFalse(YouTubeHandle.objects.filter(handle="@unknown").exists())
+
+    def test_ids_are_not_looked_up(self):
+        out, lookup = self._resolve("UCabc", "PLxyz", "")
+        self.assertEqual(out, {})
+        lookup.assert_not_called()
+
+    def test_build_feed_url_uses_given_mapping(self):
+        with mock.patch.object(services, "resolve_handle") as resolve:
+            url = services.build_feed_url("channel", "@Chan", channel_ids={"@chan": "UCabc"})
+            missing = services.build_feed_url("channel", "@other", channel_ids={"@chan": "UCabc"})
+        resolve.assert_not_called()
+        self.assertEqual(url, URL)
+        self.assertIsNone(missing)
@@ -3,7 +3,7 @@ from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from .models import YouTubeSubscription
-from .services import get_youtube_metadata
+from .services import get_youtube_metadata, resolve_handle
 
 @login_required
 def index(request):
@@ -31,6 +31,12 @@ def subscribe(request):
     if kind not in ('channel','playlist') or not target_id:
         return JsonResponse({'ok': False, 'error': 'Invalid input'}, status=400)
     sub, created = YouTubeSubscription.objects.get_or_create(user=request.user, kind=kind, target_id=target_id, defaults={'title': title})
+    if target_id.lstrip('/').startswith('@'):
+        # store the channel ID now so check_youtube does not have to scrape the channel page
+        try:
+            resolve_handle(target_id)
+        except Exception:
+            pass
     if not created and title and sub.title != title:
         sub.title = title
         sub.save(update_fields=['title'])